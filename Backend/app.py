@@ -1,12 +1,14 @@
 import os
+import hmac
 import logging
 from datetime import datetime
-from dotenv import load_dotenv
-from flask import Flask, jsonify
+from utils.env import load_env
+from flask import Flask, Response, abort, jsonify, request
+from prometheus_client import CONTENT_TYPE_LATEST
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
 
-load_dotenv()
+load_env()
 
 # Load config (reads all ENV keys)
 from config import Config
@@ -21,6 +23,8 @@ from routes.payment_complete import payment_complete_bp
 from routes.payments_webhook import payments_webhook_bp
 from routes.ocr_routes import ocr_bp
 from routes.contact_routes import contact_bp
+from utils.metrics import render_metrics
+from utils.log_queue import install_queue_logging
 
 # Optional: rate limiter (if you use it in your project)
 try:
@@ -36,6 +40,7 @@ def create_app() -> Flask:
 
     # Logging
     logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    install_queue_logging()
     app.logger.info("Booting TalkAPI backend...")
 
     # CORS - Dynamic configuration based on environment
@@ -119,6 +124,17 @@ def create_app() -> Flask:
             "allowed_proxy_domains": Config.ALLOWED_PROXY_DOMAINS,
         })
 
+    # ---- Metrics (Prometheus scrape endpoint) ----
+    # Scrapers send "Authorization: Bearer <METRICS_TOKEN>"; anyone else, or everyone
+    # when no token is configured, gets a 404
+    @app.get("/metrics")
+    def metrics():
+        token = Config.METRICS_TOKEN
+        supplied = request.headers.get("Authorization", "")
+        if not token or not hmac.compare_digest(supplied.encode(), f"Bearer {token}".encode()):
+            abort(404)
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
+
     # ---- Error handlers ----
     @app.errorhandler(HTTPException)
     def handle_http_error(err: HTTPException):
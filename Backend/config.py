@@ -24,6 +24,8 @@ class Config:
     # --- Security ---
     ALLOWED_ORIGINS = [o.strip() for o in os.getenv("ALLOWED_ORIGINS", "").split(",") if o.strip()]
     ALLOWED_PROXY_DOMAINS = [d.strip() for d in os.getenv("ALLOWED_PROXY_DOMAINS", "").split(",") if d.strip()]
+    # Bearer token for the Prometheus /metrics endpoint (endpoint disabled when unset)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
     
     # --- Development ---
     DEVELOPMENT_MODE = os.getenv("DEVELOPMENT_MODE", "false").lower() in ("true", "1", "yes")
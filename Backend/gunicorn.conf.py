@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration for the TalkAPI backend
+
+    gunicorn -c gunicorn.conf.py app:app
+
+preload_app imports the app (and supabase_client's clients/SupabaseManager) once in
+the master before forking, so workers share that memory copy-on-write instead of each
+building its own. No connections are opened at import time, so nothing socket-level
+is shared across the fork; each worker still has its own HTTP pools, sized by
+SUPABASE_POOL_SIZE.
+
+Per-worker state is not shared either:
+- Prometheus metrics are written to PROMETHEUS_MULTIPROC_DIR and aggregated across
+  workers by /metrics (see utils/metrics.py); child_exit drops a dead worker's gauges.
+- SupabaseManager's profile, history-count and JWT caches are per worker. A change made
+  through one worker is only seen by the others once their entry expires, so paths that
+  need the current row read it fresh (get_user_profile(..., fresh=True)).
+"""
+import os
+import shutil
+import tempfile
+
+# Must be set before the app (and with it prometheus_client) is imported, which
+# preload_app does right after this file is read. Cleared so counters from a
+# previous run don't leak into this one.
+PROMETHEUS_MULTIPROC_DIR = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "talkapi-prometheus")
+)
+shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+preload_app = True
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -1,13 +1,13 @@
 import os
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from dotenv import load_dotenv
+from utils.env import load_env
 from flask import request
 import datetime
 import requests
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 UPSTASH_REDIS_TCP_URL = os.getenv('UPSTASH_REDIS_TCP_URL')
 UPSTASH_REDIS_REST_URL = os.getenv('UPSTASH_REDIS_REST_URL')
@@ -6,14 +6,14 @@ from supabase_client import supabase_manager
 from flask import Blueprint, request, jsonify, make_response
 from datetime import datetime
 from limiter_config import get_limiter
-from dotenv import load_dotenv
+from utils.env import load_env
 from anthropic import Anthropic
 from validators.api_request_validator import validate_api_request
 from validators.code_output_validator import validate_generated_code
 import os, sys, io, json, re
 
 # --- Env & stdout ---
-load_dotenv()
+load_env()
 if sys.platform == "win32":
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
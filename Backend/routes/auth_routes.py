@@ -7,10 +7,10 @@ from flask import Blueprint, request, jsonify
 import requests
 import os
 import logging
-from dotenv import load_dotenv
+from utils.env import load_env
 
 # Load environment variables
-load_dotenv()
+load_env()
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
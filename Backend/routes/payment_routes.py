@@ -26,6 +26,7 @@ from flask import Blueprint, request, jsonify
 import os
 import logging
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
 from services.payment_service import create_recurring_payment, format_payload_initial
@@ -62,6 +63,74 @@ FREE_LIMITS = {"total_limit": 50}                       # combined monthly quota
 FRONTEND_URL = os.getenv("FRONTEND_URL")
 BACKEND_URL = os.getenv("BACKEND_URL")
 
+# Worker threads for post-payment work (invoice + confirmation email) that
+# shouldn't hold up the HTTP response
+_BACKGROUND_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="payment-bg")
+
+
+def _create_invoice_and_send_confirmation(user_id, user_email, user_name, invoice_name, amount,
+                                          currency_code, card_last_4, transaction_id):
+    """
+    Create the Tranzila invoice and send the payment confirmation email.
+
+    Runs on _BACKGROUND_EXECUTOR after the upgrade has been committed, so the
+    payment response doesn't wait on Tranzila Billing or SMTP. Failures are
+    logged only - the user is already upgraded at this point.
+    """
+    # Create invoice (non-critical - don't fail if this errors)
+    invoice = None
+    invoice_url = None
+    try:
+        logger.info(f"📄 Creating invoice for user {user_id}")
+
+        # Convert numeric currency code to ISO code for Billing API
+        # Tranzila Hosted Fields returns "2" for USD, but Billing API needs "USD"
+        currency_code_raw = currency_code or "2"
+        currency_code_iso = CURRENCY_CODE_MAP.get(str(currency_code_raw), "USD")
+        logger.info(f"   Currency conversion: {currency_code_raw} -> {currency_code_iso}")
+
+        invoice = billing_service.create_invoice(
+            user_email=user_email,
+            user_name=invoice_name,
+            amount=amount or 19.00,  # Default to $19 if not provided
+            currency_code=currency_code_iso,  # Use ISO code instead of numeric
+            card_last_4=card_last_4,
+            transaction_id=transaction_id,
+            plan_name="TalkAPI Pro Monthly Subscription"
+        )
+        invoice_url = invoice.get('document_url')
+        logger.info(f"✅ Invoice created: {invoice.get('document_number')}")
+        if invoice_url:
+            logger.info(f"   PDF URL: {invoice_url}")
+    except Exception as invoice_error:
+        logger.warning(f"⚠️ Failed to create invoice (non-critical): {str(invoice_error)}")
+
+    # Send payment confirmation email (non-critical - don't fail if this errors)
+    try:
+        logger.info(f"📧 Sending payment confirmation email to {user_email}")
+        email_sent = email_service.send_payment_success_email(
+            user_email=user_email,
+            user_name=user_name,
+            amount=float(amount) if amount else 19.00,
+            plan_type="pro",
+            transaction_id=transaction_id or "N/A",
+            invoice_url=invoice_url,
+            daily_limit=100,
+            monthly_limit=2000
+        )
+        if email_sent:
+            logger.info(f"✅ Payment confirmation email sent successfully")
+        else:
+            logger.warning(f"⚠️ Failed to send payment confirmation email")
+    except Exception as email_error:
+        logger.warning(f"⚠️ Failed to send email (non-critical): {str(email_error)}")
+
+    # Warm the invoice PDF cache so the first click on the emailed link is
+    # served without a round-trip to Tranzila
+    if invoice and invoice.get('document_id'):
+        billing_service.download_invoice_pdf(invoice['document_id'])
+
+
 @payment_bp.route("/payment/create-handshake", methods=["POST", "OPTIONS"])
 def create_handshake():
     """
@@ -278,52 +347,19 @@ def upgrade_after_hosted_payment():
             if sto_id:
                 logger.info(f"✅ Recurring billing enabled with STO ID: {sto_id}")
 
-            # 6) Create invoice (non-critical - don't fail if this errors)
-            invoice_url = None
-            try:
-                logger.info(f"📄 Creating invoice for user {user_id}")
-
-                # Convert numeric currency code to ISO code for Billing API
-                # Tranzila Hosted Fields returns "2" for USD, but Billing API needs "USD"
-                currency_code_raw = currency_code or "2"
-                currency_code_iso = CURRENCY_CODE_MAP.get(str(currency_code_raw), "USD")
-                logger.info(f"   Currency conversion: {currency_code_raw} -> {currency_code_iso}")
-
-                invoice = billing_service.create_invoice(
-                    user_email=user_email,
-                    user_name=user_data.get('full_name') or user_email,
-                    amount=amount or 19.00,  # Default to $19 if not provided
-                    currency_code=currency_code_iso,  # Use ISO code instead of numeric
-                    card_last_4=card_last_4,
-                    transaction_id=transaction_id,
-                    plan_name="TalkAPI Pro Monthly Subscription"
-                )
-                invoice_url = invoice.get('document_url')
-                logger.info(f"✅ Invoice created: {invoice.get('document_number')}")
-                if invoice_url:
-                    logger.info(f"   PDF URL: {invoice_url}")
-            except Exception as invoice_error:
-                logger.warning(f"⚠️ Failed to create invoice (non-critical): {str(invoice_error)}")
-
-            # 7) Send payment confirmation email (non-critical - don't fail if this errors)
-            try:
-                logger.info(f"📧 Sending payment confirmation email to {user_email}")
-                email_sent = email_service.send_payment_success_email(
-                    user_email=user_email,
-                    user_name=user_data.get('full_name') or full_name or user_email,
-                    amount=float(amount) if amount else 19.00,
-                    plan_type="pro",
-                    transaction_id=transaction_id or "N/A",
-                    invoice_url=invoice_url,
-                    daily_limit=100,
-                    monthly_limit=2000
-                )
-                if email_sent:
-                    logger.info(f"✅ Payment confirmation email sent successfully")
-                else:
-                    logger.warning(f"⚠️ Failed to send payment confirmation email")
-            except Exception as email_error:
-                logger.warning(f"⚠️ Failed to send email (non-critical): {str(email_error)}")
+            # 6-7) Create invoice and send confirmation email in the background
+            # (non-critical, and Tranzila Billing can take seconds to respond)
+            _BACKGROUND_EXECUTOR.submit(
+                _create_invoice_and_send_confirmation,
+                user_id=user_id,
+                user_email=user_email,
+                user_name=user_data.get('full_name') or full_name or user_email,
+                invoice_name=user_data.get('full_name') or user_email,
+                amount=amount,
+                currency_code=currency_code,
+                card_last_4=card_last_4,
+                transaction_id=transaction_id,
+            )
 
             return jsonify({
                 "status": "success",
@@ -332,7 +368,7 @@ def upgrade_after_hosted_payment():
                 "limits": PRO_LIMITS,
                 "sto_id": sto_id,  # Include STO ID in response
                 "recurring_billing": "enabled" if sto_id else "disabled",
-                "invoice_url": invoice_url  # Optional: frontend can display this
+                "invoice_status": "pending"  # Invoice link is delivered by email
             }), 200
         else:
             logger.error(f"❌ Failed to update user {user_id} profile")
@@ -574,11 +610,13 @@ def cancel_payment():
             user_name = user_data.get('full_name') or user_data.get('user_metadata', {}).get('full_name') or user_email.split('@')[0]
             logger.info(f"   Sending to: {user_email}, Name: {user_name}")
 
+            # Sent on the email worker pool - the response doesn't wait on SMTP
             email_service.send_subscription_cancelled_email(
                 user_email=user_email,
-                user_name=user_name
+                user_name=user_name,
+                wait=False
             )
-            logger.info(f"✅ Cancellation email sent successfully")
+            logger.info(f"✅ Cancellation email queued")
         except Exception as email_error:
             logger.warning(f"⚠️ Failed to send cancellation email (non-critical): {str(email_error)}")
             logger.exception(f"   Full error details:")
@@ -629,6 +667,16 @@ def download_invoice(document_id):
             "message": "Invalid document ID"
         }), 400
 
+    # Issued invoices are immutable, so the document_id itself is a valid ETag.
+    # A browser revalidating a PDF it already has gets a 304 without any download.
+    etag = f"invoice-{document_id}"
+    # Match the tag itself (strong or weak), not "*": `etag in if_none_match` is also
+    # true for a wildcard, which would 304 an invoice this browser never downloaded
+    if_none_match = request.if_none_match
+    if if_none_match.is_strong(etag) or if_none_match.is_weak(etag):
+        logger.info(f"✅ Invoice {document_id} not modified (304)")
+        return "", 304, {'ETag': f'"{etag}"'}
+
     # Download PDF from Tranzila with authentication
     try:
         pdf_content = billing_service.download_invoice_pdf(document_id)
@@ -650,7 +698,9 @@ def download_invoice(document_id):
             headers={
                 'Content-Disposition': f'inline; filename=TalkAPI_Invoice.pdf',
                 'Content-Type': 'application/pdf',
-                'Cache-Control': 'private, max-age=3600'  # Cache for 1 hour
+                # Issued invoices never change, so browsers may reuse the PDF for an hour
+                'Cache-Control': f'private, max-age={billing_service.PDF_CACHE_TTL_SECONDS}, immutable',
+                'ETag': f'"{etag}"'
             }
         )
 
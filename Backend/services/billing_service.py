@@ -3,249 +3,455 @@ Tranzila Billing Service
 Handles invoice creation and management using Tranzila Billing API
 """
 
+import asyncio
+import io
 import os
+import json
 import logging
+import threading
+import time
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-from typing import Dict, Optional
-from .tranzila_service import generate_tranzila_headers
+from typing import Dict, List, Optional
+from .tranzila_service import HTTP2_AVAILABLE, generate_tranzila_headers
+from utils.metrics import observe_tranzila_request, record_tranzila_error
+from utils.ttl_cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+__all__ = ['create_invoice', 'create_invoice_async', 'create_invoices_batch', 'create_invoices_batch_async', 'download_invoice_pdf', 'get_invoice_pdf_url']
+
 # Environment variables
 TRANZILA_SUPPLIER = os.getenv("TRANZILA_SUPPLIER")
 TRANZILA_PUBLIC_API_KEY = os.getenv("TRANZILA_PUBLIC_API_KEY")
 TRANZILA_SECRET_API_KEY = os.getenv("TRANZILA_SECRET_API_KEY")
 
+# Reuse window for generated auth headers, in seconds. 0 (default) disables reuse:
+# only raise it if the terminal accepts the same nonce for repeated requests.
+TRANZILA_HEADER_CACHE_SECONDS = float(os.getenv("TRANZILA_HEADER_CACHE_SECONDS", "0"))
 
-def create_invoice(
-    user_email: str,
-    user_name: str,
-    amount: float,
-    currency_code: str = "USD",
-    card_last_4: Optional[str] = None,
-    transaction_id: Optional[str] = None,
-    plan_name: str = "TalkAPI Pro Subscription"
-) -> Dict:
-    """
-    Create an invoice in Tranzila Billing system
+# Public base URL for invoice links sent by email (our /payment/invoice proxy).
+# Always use production URL for invoice links
+# This ensures invoice links work even when emails are sent from dev environment
+# The BACKEND_URL env var will override this in production
+BACKEND_URL = os.getenv("BACKEND_URL", "https://askapi-0vze.onrender.com")
+INVOICE_URL_PREFIX = BACKEND_URL + "/payment/invoice/"
 
-    Args:
-        user_email: Customer email address
-        user_name: Customer full name
-        amount: Payment amount
-        currency_code: Currency (default: USD)
-        card_last_4: Last 4 digits of credit card
-        transaction_id: Transaction ID from payment
-        plan_name: Name of the product/service
+# Tranzila Billing endpoints
+CREATE_DOCUMENT_URL = "https://billing5.tranzila.com/api/documents_db/create_document"
+GET_DOCUMENT_URL = "https://billing5.tranzila.com/api/documents_db/get_document"
 
-    Returns:
-        Dict with invoice details including document_number and document_url (PDF)
+# Shared HTTP session for Tranzila Billing calls.
+# Reusing one session keeps TCP/TLS connections to billing5.tranzila.com alive
+# between invoice creations and PDF downloads instead of re-handshaking every call.
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session() -> requests.Session:
     """
-    logger.info(f"📄 Creating invoice for {user_email} - Amount: {amount} {currency_code}")
+    Return the module-level Tranzila session, creating it on first use.
 
-    url = "https://billing5.tranzila.com/api/documents_db/create_document"
+    Created lazily (under a lock) so each gunicorn worker builds its own
+    session after fork rather than sharing sockets with the master process.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                # Default (incl. create_document): only retry failures to connect, where the
+                # request never reached Tranzila - replaying a create could issue a duplicate invoice
+                session.mount("https://", HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=20,
+                    max_retries=Retry(total=3, connect=3, read=0, status=0, backoff_factor=0.4),
+                ))
+                # get_document is a read-only POST, so transient timeouts and 5xx are safe to retry
+                session.mount(GET_DOCUMENT_URL, HTTPAdapter(
+                    pool_connections=10,
+                    pool_maxsize=20,
+                    max_retries=Retry(
+                        total=3,
+                        connect=3,
+                        read=2,
+                        backoff_factor=0.4,
+                        status_forcelist=(502, 503, 504),
+                        allowed_methods=("GET", "POST"),
+                        respect_retry_after_header=True,
+                        raise_on_status=False,
+                    ),
+                ))
+                session.headers.update({"Connection": "keep-alive"})
+                _SESSION = session
+    return _SESSION
+
+
+_HEADER_CACHE = {"headers": None, "expires_at": 0.0}
+_HEADER_CACHE_LOCK = threading.Lock()
+
+
+def _get_tranzila_headers() -> Dict[str, str]:
+    """
+    Return Tranzila auth headers, reusing recent ones within TRANZILA_HEADER_CACHE_SECONDS.
 
+    With the default window of 0 a fresh timestamp/nonce/HMAC is generated per call.
+    """
+    if TRANZILA_HEADER_CACHE_SECONDS <= 0:
+        return generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
+
+    with _HEADER_CACHE_LOCK:
+        now = time.monotonic()
+        if _HEADER_CACHE["headers"] is None or now >= _HEADER_CACHE["expires_at"]:
+            _HEADER_CACHE["headers"] = generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
+            _HEADER_CACHE["expires_at"] = now + TRANZILA_HEADER_CACHE_SECONDS
+        return dict(_HEADER_CACHE["headers"])
+
+
+# In-process LRU + TTL cache of downloaded invoice PDFs (document_id -> bytes).
+# Issued invoices never change, so repeat clicks on the email link are served
+# from memory instead of re-downloading from Tranzila.
+PDF_CACHE_MAX_ENTRIES = 512
+PDF_CACHE_TTL_SECONDS = 3600
+PDF_CACHE_MAX_BYTES = 5 * 1024 * 1024  # Don't cache unusually large PDFs
+
+# Streaming limits for PDF downloads: (connect, read) timeout, chunk size and a hard size cap
+PDF_DOWNLOAD_TIMEOUT = (5, 30)
+PDF_DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PDF_DOWNLOAD_MAX_BYTES = 10 * 1024 * 1024
+PDF_MAGIC = b"%PDF-"
+
+_PDF_CACHE = TTLCache(PDF_CACHE_MAX_ENTRIES, PDF_CACHE_TTL_SECONDS)
+
+# create_invoice results by transaction_id, so a retried upgrade for the same
+# payment returns the existing invoice instead of issuing a duplicate one
+INVOICE_RESULT_CACHE_MAX_ENTRIES = 4096
+INVOICE_RESULT_CACHE_TTL_SECONDS = 86400
+
+_INVOICE_RESULT_CACHE = TTLCache(INVOICE_RESULT_CACHE_MAX_ENTRIES, INVOICE_RESULT_CACHE_TTL_SECONDS)
+
+
+# document_date / payment_date only have day granularity, so the formatted
+# date is reused for up to a minute instead of being re-formatted per invoice
+_DATE_CACHE = {"value": "", "expires_at": 0.0}
+_DATE_CACHE_TTL_SECONDS = 60
+
+
+def _today() -> str:
+    """Return today's date as YYYY-MM-DD (cached for _DATE_CACHE_TTL_SECONDS)."""
+    now = time.monotonic()
+    if now >= _DATE_CACHE["expires_at"]:
+        _DATE_CACHE["value"] = datetime.now().strftime("%Y-%m-%d")
+        _DATE_CACHE["expires_at"] = now + _DATE_CACHE_TTL_SECONDS
+    return _DATE_CACHE["value"]
+
+
+# Static parts of the create_document payload, built once at import.
+# create_invoice merges these with the per-call fields; the nested items and
+# payments dicts are fresh copies on every call, so the templates are never mutated.
+_BASE_DOCUMENT = {
+    "document_type": "RE",  # Receipt (simpler than IR, doesn't require tax invoice settings)
+    "vat_percent": 17,  # Israeli VAT
+    "action": 1,  # 1 = create document
+
+    # Client details
+    "client_country_code": "IL",  # Israel
+    "client_company": "",  # Optional - can be populated from user profile later
+    "client_id": "",  # Optional - can be populated from user profile later
+    "client_address_line_1": "",  # Optional - can be populated from user profile later
+    "client_address_line_2": "",  # Optional - can be populated from user profile later
+    "client_city": "",  # Optional - can be populated from user profile later
+    "client_zip": "",  # Optional - can be populated from user profile later
+
+    "document_language": "eng",  # English as requested
+    "response_language": "eng",
+    "created_by_system": "TalkAPI Payment System",
+}
+
+# Items - what was purchased
+# ALL fields must be strings per Invoice-items documentation
+_BASE_ITEM = {
+    "type": "I",  # Optional: string - I=Item, S=Shipping, C=Coupon
+    "price_type": "G",  # Optional: string - G=Gross (VAT extracted)
+    "units_number": "1",  # Optional: string (not int!)
+    "units_type": "1",  # Optional: string - 1=Unit (per Unit types table)
+    "to_doc_currency_exchange_rate": "1",  # Optional: string (not int!)
+}
+
+# Payment details
+_BASE_PAYMENT = {
+    "payment_method": 1,  # Credit card (per Payment methods table: 1=CC, 3=Cheque, etc)
+    "to_doc_currency_exchange_rate": "1",  # Must be string!
+
+    # Credit Card required fields (per Params-Table documentation)
+    "cc_credit_term": 1,  # 1=Regular, 6=Credit plan, 8=Payments (Integer!)
+    "cc_installments_number": 1,  # Single payment (Integer!)
+    "cc_brand": 2,  # Default to 2=Visa (Integer!)
+}
+
+
+def _build_invoice_payload(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    currency_code: str,
+    card_last_4: Optional[str],
+    transaction_id: Optional[str],
+    plan_name: str
+) -> Dict:
+    """Build the create_document payload for a single paid invoice."""
     # Prepare payload according to Tranzila Billing API spec
+    today = _today()
+    # Currency amount with exactly two decimals (str(3.1) would give "3.1",
+    # and float noise like 19.000000001 would otherwise leak through)
+    amount_str = f"{float(amount):.2f}"
     payload = {
+        **_BASE_DOCUMENT,
         "terminal_name": TRANZILA_SUPPLIER,
-        "document_date": datetime.now().strftime("%Y-%m-%d"),  # Current date
-        "document_type": "RE",  # Receipt (simpler than IR, doesn't require tax invoice settings)
+        "document_date": today,
         "document_currency_code": currency_code,
-        "vat_percent": 17,  # Israeli VAT
-        "action": 1,  # 1 = create document
-
-        # Client details
         "client_name": user_name,
         "client_email": user_email,
-        "client_country_code": "IL",  # Israel
-        "client_company": "",  # Optional - can be populated from user profile later
-        "client_id": "",  # Optional - can be populated from user profile later
-        "client_address_line_1": "",  # Optional - can be populated from user profile later
-        "client_address_line_2": "",  # Optional - can be populated from user profile later
-        "client_city": "",  # Optional - can be populated from user profile later
-        "client_zip": "",  # Optional - can be populated from user profile later
-
-        "document_language": "eng",  # English as requested
-        "response_language": "eng",
-        "created_by_system": "TalkAPI Payment System",
         "client_receipt_paid_for": plan_name,  # Product/service name (recommended for RE type)
-
-        # Items - what was purchased
-        # ALL fields must be strings per Invoice-items documentation
         "items": [
             {
+                **_BASE_ITEM,
                 "name": plan_name,  # Required: string
-                "unit_price": str(amount),  # Required: string (not float!)
-                "type": "I",  # Optional: string - I=Item, S=Shipping, C=Coupon
-                "price_type": "G",  # Optional: string - G=Gross (VAT extracted)
-                "units_number": "1",  # Optional: string (not int!)
-                "units_type": "1",  # Optional: string - 1=Unit (per Unit types table)
+                "unit_price": amount_str,  # Required: string (not float!)
                 "currency_code": currency_code,  # Optional: string
-                "to_doc_currency_exchange_rate": "1"  # Optional: string (not int!)
             }
         ],
-
-        # Payment details
-        # ALL fields must be strings per Tranzila docs
         "payments": [
             {
-                "payment_method": 1,  # Credit card (per Payment methods table: 1=CC, 3=Cheque, etc)
-                "payment_date": datetime.now().strftime("%Y-%m-%d"),  # Current date (string format)
-                "amount": str(amount),  # Must be string!
+                **_BASE_PAYMENT,
+                "payment_date": today,  # Current date (string format)
+                "amount": amount_str,  # Must be string!
                 "currency_code": currency_code,  # String
-                "to_doc_currency_exchange_rate": "1",  # Must be string!
-
-                # Credit Card required fields (per Params-Table documentation)
-                "cc_credit_term": 1,  # 1=Regular, 6=Credit plan, 8=Payments (Integer!)
-                "cc_installments_number": 1,  # Single payment (Integer!)
-                "cc_brand": 2,  # Default to 2=Visa (Integer!)
             }
         ]
     }
 
     # Add optional Credit Card fields if available
     if card_last_4:
-        payload["payments"][0]["cc_last_4_digits"] = str(card_last_4)
+        card_last_4 = str(card_last_4)
+        if len(card_last_4) == 4 and card_last_4.isdigit():
+            payload["payments"][0]["cc_last_4_digits"] = card_last_4
+        else:
+            logger.warning(f"⚠️ Ignoring malformed card_last_4: {card_last_4!r}")
 
     if transaction_id:
         # txnindex must be integer (per documentation)
-        if str(transaction_id).isdigit():
+        if isinstance(transaction_id, int):
+            payload["payments"][0]["txnindex"] = transaction_id
+        elif str(transaction_id).isdigit():
             payload["payments"][0]["txnindex"] = int(transaction_id)
 
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Invoice payload: %s", json.dumps(payload, default=str, ensure_ascii=False))
+    logger.info("📡 Sending invoice creation request to Tranzila Billing (terminal=%s, customer=%s, amount=%s %s)",
+                TRANZILA_SUPPLIER, user_email, amount, currency_code)
+
+    return payload
+
+
+def _parse_invoice_response(status: int, content: bytes, transaction_id: Optional[str]) -> Dict:
+    """
+    Turn a create_document HTTP response into the create_invoice result dict.
+
+    Raises Exception on a non-200 status or a Tranzila error status_code.
+    """
+    # Check if request was successful
+    if status != 200:
+        logger.error(f"❌ Invoice creation failed with status {status}")
+        logger.error(f"   Response: {content.decode('utf-8', 'replace')}")
+        raise Exception(f"Invoice API returned status {status}")
+
+    # Parse response
+    data = orjson.loads(content)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Invoice API response: %s", data)
+
+    # Check for errors in response
+    # Tranzila returns 'status_code' (not 'error_code')
+    # 0 = Success, anything else = Error
+    status_code = data.get("status_code")
+    if status_code is None or status_code != 0:
+        error_message = data.get("status_msg") or data.get("message", "Unknown error")
+        logger.error(f"❌ Invoice creation failed: {error_message}")
+        logger.error(f"   Status Code: {status_code}")
+        logger.error(f"   Full Response: {data}")
+        raise Exception(f"Invoice creation failed: {error_message}")
+
+    # Extract document details from 'document' object
+    document_data = data.get("document", {})
+    document_number = document_data.get("number")
+    document_id = document_data.get("id")
+    retrieval_key = document_data.get("retrieval_key")
+    created_at = document_data.get("created_at")
+    total_amount = document_data.get("total_charge_amount")
+    currency = document_data.get("currency")
+
+    # Build PDF URL using our proxy endpoint
+    # This allows users to download from email without authentication issues
+    # Format: https://your-backend.com/payment/invoice/{document_id}
+    document_url = INVOICE_URL_PREFIX + str(document_id) if document_id else None
+
+    if not document_number:
+        logger.warning("⚠️ No document number returned from Tranzila")
+        logger.warning(f"⚠️ Full response: {data}")
+
+    logger.info("✅ Invoice created (HTTP %s, document_id=%s, number=%s, amount=%s %s)",
+                status, document_id, document_number, total_amount, currency)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("   Created At: %s", created_at)
+        logger.debug("   Retrieval Key: %s", f"{retrieval_key[:20]}..." if retrieval_key else "N/A")
+        logger.debug("   Document URL (proxy): %s", document_url or "N/A")
+
+    result = {
+        "success": True,
+        "document_id": document_id,
+        "document_number": document_number,
+        "document_url": document_url,
+        "retrieval_key": retrieval_key,
+        "total_amount": total_amount,
+        "currency": currency,
+        "created_at": created_at,
+        "raw_response": data
+    }
+    if transaction_id:
+        _INVOICE_RESULT_CACHE.set(str(transaction_id), result)
+    return result
+
+
+def _get_cached_invoice(transaction_id: Optional[str]) -> Optional[Dict]:
+    """Return the invoice already created for transaction_id, if any."""
+    if not transaction_id:
+        return None
+    cached_invoice = _INVOICE_RESULT_CACHE.get(str(transaction_id))
+    if cached_invoice is not None:
+        logger.info(f"✅ Invoice for transaction {transaction_id} already created: {cached_invoice.get('document_number')}")
+    return cached_invoice
+
+
+def create_invoice(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    currency_code: str = "USD",
+    card_last_4: Optional[str] = None,
+    transaction_id: Optional[str] = None,
+    plan_name: str = "TalkAPI Pro Subscription"
+) -> Dict:
+    """
+    Create an invoice in Tranzila Billing system
+
+    Args:
+        user_email: Customer email address
+        user_name: Customer full name
+        amount: Payment amount
+        currency_code: Currency (default: USD)
+        card_last_4: Last 4 digits of credit card
+        transaction_id: Transaction ID from payment
+        plan_name: Name of the product/service
+
+    Returns:
+        Dict with invoice details including document_number and document_url (PDF)
+    """
+    logger.info(f"📄 Creating invoice for {user_email} - Amount: {amount} {currency_code}")
+
+    cached_invoice = _get_cached_invoice(transaction_id)
+    if cached_invoice is not None:
+        return cached_invoice
+
+    payload = _build_invoice_payload(
+        user_email, user_name, amount, currency_code, card_last_4, transaction_id, plan_name
+    )
+
     # Generate Tranzila API headers
-    headers = generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
-
-    logger.info("=" * 80)
-    logger.info("📄 INVOICE CREATION - FULL PAYLOAD DEBUG")
-    logger.info("=" * 80)
-    logger.info(f"URL: {url}")
-    logger.info(f"Terminal: {TRANZILA_SUPPLIER}")
-    logger.info(f"Customer: {user_name} ({user_email})")
-    logger.info("-" * 80)
-    logger.info("PAYLOAD STRUCTURE:")
-    logger.info(f"  document_type: {payload['document_type']}")
-    logger.info(f"  document_date: {payload['document_date']}")
-    logger.info(f"  document_currency_code: {payload['document_currency_code']}")
-    logger.info(f"  vat_percent: {payload['vat_percent']}")
-    logger.info(f"  action: {payload['action']}")
-    logger.info(f"  client_name: {payload['client_name']}")
-    logger.info(f"  client_email: {payload['client_email']}")
-    logger.info(f"  client_country_code: {payload['client_country_code']}")
-    logger.info(f"  client_company: {payload['client_company']}")
-    logger.info(f"  client_id: {payload['client_id']}")
-    logger.info(f"  client_address_line_1: {payload['client_address_line_1']}")
-    logger.info(f"  client_address_line_2: {payload['client_address_line_2']}")
-    logger.info(f"  client_city: {payload['client_city']}")
-    logger.info(f"  client_zip: {payload['client_zip']}")
-    logger.info(f"  client_receipt_paid_for: {payload['client_receipt_paid_for']}")
-    logger.info("-" * 80)
-    logger.info("ITEMS:")
-    for idx, item in enumerate(payload['items']):
-        logger.info(f"  Item {idx + 1}:")
-        logger.info(f"    name: {item['name']}")
-        logger.info(f"    unit_price: {item['unit_price']} (type: {type(item['unit_price']).__name__})")
-        logger.info(f"    units_number: {item['units_number']} (type: {type(item['units_number']).__name__})")
-        logger.info(f"    units_type: {item['units_type']} (type: {type(item['units_type']).__name__})")
-        logger.info(f"    type: {item['type']}")
-        logger.info(f"    price_type: {item['price_type']}")
-        logger.info(f"    currency_code: {item['currency_code']}")
-        logger.info(f"    to_doc_currency_exchange_rate: {item['to_doc_currency_exchange_rate']}")
-    logger.info("-" * 80)
-    logger.info("PAYMENTS:")
-    for idx, payment in enumerate(payload['payments']):
-        logger.info(f"  Payment {idx + 1}:")
-        logger.info(f"    payment_method: {payment['payment_method']}")
-        logger.info(f"    payment_date: {payment['payment_date']}")
-        logger.info(f"    amount: {payment['amount']} (type: {type(payment['amount']).__name__})")
-        logger.info(f"    currency_code: {payment['currency_code']}")
-        logger.info(f"    to_doc_currency_exchange_rate: {payment['to_doc_currency_exchange_rate']} (type: {type(payment['to_doc_currency_exchange_rate']).__name__})")
-        logger.info(f"    cc_credit_term: {payment['cc_credit_term']} (type: {type(payment['cc_credit_term']).__name__})")
-        logger.info(f"    cc_installments_number: {payment['cc_installments_number']} (type: {type(payment['cc_installments_number']).__name__})")
-        logger.info(f"    cc_brand: {payment['cc_brand']} (type: {type(payment['cc_brand']).__name__})")
-        if 'cc_last_4_digits' in payment:
-            logger.info(f"    cc_last_4_digits: {payment['cc_last_4_digits']}")
-        if 'txnindex' in payment:
-            logger.info(f"    txnindex: {payment['txnindex']} (type: {type(payment['txnindex']).__name__})")
-    logger.info("=" * 80)
-    logger.info("📡 Sending invoice creation request to Tranzila Billing")
-    logger.info("=" * 80)
+    headers = _get_tranzila_headers()
 
     try:
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-
-        logger.info(f"📡 Invoice API Response Status: {response.status_code}")
-
-        # Check if request was successful
-        if response.status_code != 200:
-            logger.error(f"❌ Invoice creation failed with status {response.status_code}")
-            logger.error(f"   Response: {response.text}")
-            raise Exception(f"Invoice API returned status {response.status_code}")
-
-        # Parse response
-        data = response.json()
-        logger.info(f"📄 Invoice API Response: {data}")
-
-        # Check for errors in response
-        # Tranzila returns 'status_code' (not 'error_code')
-        # 0 = Success, anything else = Error
-        status_code = data.get("status_code")
-        if status_code is None or status_code != 0:
-            error_message = data.get("status_msg") or data.get("message", "Unknown error")
-            logger.error(f"❌ Invoice creation failed: {error_message}")
-            logger.error(f"   Status Code: {status_code}")
-            logger.error(f"   Full Response: {data}")
-            raise Exception(f"Invoice creation failed: {error_message}")
-
-        # Extract document details from 'document' object
-        document_data = data.get("document", {})
-        document_number = document_data.get("number")
-        document_id = document_data.get("id")
-        retrieval_key = document_data.get("retrieval_key")
-        created_at = document_data.get("created_at")
-        total_amount = document_data.get("total_charge_amount")
-        currency = document_data.get("currency")
-
-        # Build PDF URL using our proxy endpoint
-        # This allows users to download from email without authentication issues
-        # Format: https://your-backend.com/payment/invoice/{document_id}
-        document_url = None
-        if document_id:
-            # Always use production URL for invoice links
-            # This ensures invoice links work even when emails are sent from dev environment
-            # The BACKEND_URL env var will override this in production
-            backend_url = os.getenv("BACKEND_URL", "https://askapi-0vze.onrender.com")
-            document_url = f"{backend_url}/payment/invoice/{document_id}"
-
-        if not document_number:
-            logger.warning("⚠️ No document number returned from Tranzila")
-            logger.warning(f"⚠️ Full response: {data}")
-
-        logger.info(f"✅ Invoice created successfully!")
-        logger.info(f"   Document ID: {document_id}")
-        logger.info(f"   Document Number: {document_number}")
-        logger.info(f"   Amount: {total_amount} {currency}")
-        logger.info(f"   Created At: {created_at}")
-        logger.info(f"   Retrieval Key: {retrieval_key[:20]}..." if retrieval_key else "   Retrieval Key: N/A")
-        logger.info(f"   Document URL (proxy): {document_url or 'N/A'}")
-
-        return {
-            "success": True,
-            "document_id": document_id,
-            "document_number": document_number,
-            "document_url": document_url,
-            "retrieval_key": retrieval_key,
-            "total_amount": total_amount,
-            "currency": currency,
-            "created_at": created_at,
-            "raw_response": data
-        }
+        # headers already carry Content-Type: application/json
+        started_at = time.perf_counter()
+        response = _get_session().post(CREATE_DOCUMENT_URL, data=orjson.dumps(payload), headers=headers, timeout=30)
+        observe_tranzila_request("create_document", response.status_code, started_at)
+        return _parse_invoice_response(response.status_code, response.content, transaction_id)
 
     except requests.exceptions.Timeout:
+        record_tranzila_error("create_document", "timeout")
         logger.error("❌ Invoice creation request timed out")
         raise Exception("Invoice creation timed out after 30 seconds")
 
     except requests.exceptions.RequestException as e:
+        record_tranzila_error("create_document", "http")
+        logger.error(f"❌ HTTP error creating invoice: {str(e)}")
+        raise Exception(f"Invoice creation HTTP error: {str(e)}")
+
+    except Exception as e:
+        logger.error(f"❌ Unexpected error creating invoice: {str(e)}")
+        raise
+
+
+def _new_async_client() -> httpx.AsyncClient:
+    """Build an AsyncClient sized for concurrent Tranzila Billing calls (HTTP/2 multiplexed when h2 is installed)."""
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+    )
+
+
+async def create_invoice_async(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    currency_code: str = "USD",
+    card_last_4: Optional[str] = None,
+    transaction_id: Optional[str] = None,
+    plan_name: str = "TalkAPI Pro Subscription",
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict:
+    """
+    Async variant of create_invoice for callers running in an event loop
+
+    Pass a shared httpx.AsyncClient to reuse its connection pool across many
+    invoices; without one, a short-lived client is created for this call.
+
+    Returns:
+        Same dict as create_invoice
+    """
+    logger.info(f"📄 Creating invoice (async) for {user_email} - Amount: {amount} {currency_code}")
+
+    cached_invoice = _get_cached_invoice(transaction_id)
+    if cached_invoice is not None:
+        return cached_invoice
+
+    payload = _build_invoice_payload(
+        user_email, user_name, amount, currency_code, card_last_4, transaction_id, plan_name
+    )
+    headers = _get_tranzila_headers()
+
+    try:
+        started_at = time.perf_counter()
+        if client is None:
+            async with _new_async_client() as own_client:
+                response = await own_client.post(CREATE_DOCUMENT_URL, content=orjson.dumps(payload), headers=headers)
+        else:
+            response = await client.post(CREATE_DOCUMENT_URL, content=orjson.dumps(payload), headers=headers)
+        observe_tranzila_request("create_document", response.status_code, started_at)
+        return _parse_invoice_response(response.status_code, response.content, transaction_id)
+
+    except httpx.TimeoutException:
+        record_tranzila_error("create_document", "timeout")
+        logger.error("❌ Invoice creation request timed out")
+        raise Exception("Invoice creation timed out after 30 seconds")
+
+    except httpx.HTTPError as e:
+        record_tranzila_error("create_document", "http")
         logger.error(f"❌ HTTP error creating invoice: {str(e)}")
         raise Exception(f"Invoice creation HTTP error: {str(e)}")
 
@@ -254,6 +460,60 @@ def create_invoice(
         raise
 
 
+async def create_invoices_batch_async(invoices: List[Dict], max_concurrency: int = 8) -> List[Dict]:
+    """
+    Async version of create_invoices_batch (same arguments and result),
+    for callers already running inside an event loop
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with _new_async_client() as client:
+        async def _create_one(invoice: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    return await create_invoice_async(**invoice, client=client)
+                except Exception as e:
+                    return {"success": False, "error": str(e), "transaction_id": invoice.get("transaction_id")}
+
+        return await asyncio.gather(*(_create_one(invoice) for invoice in invoices))
+
+
+def create_invoices_batch(invoices: List[Dict], max_concurrency: int = 8) -> List[Dict]:
+    """
+    Create many invoices concurrently (e.g. for a bulk renewal run)
+
+    Tranzila Billing has no multi-document create endpoint, so invoices are sent
+    as parallel create_document requests over one shared connection pool.
+
+    Runs its own event loop, so it is for synchronous callers only; inside a
+    running loop await create_invoices_batch_async instead.
+
+    Args:
+        invoices: List of create_invoice keyword-argument dicts
+        max_concurrency: Maximum number of in-flight requests to Tranzila
+
+    Returns:
+        One result per input, in order. Failed invoices are returned as
+        {"success": False, "error": ..., "transaction_id": ...} instead of raising.
+
+    Raises:
+        RuntimeError: If called from inside a running event loop
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError(
+            "create_invoices_batch cannot run inside an event loop; "
+            "await create_invoices_batch_async instead"
+        )
+    if not invoices:
+        return []
+    logger.info(f"📄 Creating {len(invoices)} invoices (max {max_concurrency} concurrent)")
+    return asyncio.run(create_invoices_batch_async(invoices, max_concurrency))
+
+
 def download_invoice_pdf(document_id: int) -> Optional[bytes]:
     """
     Download invoice PDF from Tranzila using document_id
@@ -269,8 +529,13 @@ def download_invoice_pdf(document_id: int) -> Optional[bytes]:
     """
     logger.info(f"📥 Downloading invoice PDF with document_id: {document_id}")
 
+    cached_pdf = _PDF_CACHE.get(int(document_id))
+    if cached_pdf is not None:
+        logger.info(f"✅ PDF served from cache ({len(cached_pdf)} bytes)")
+        return cached_pdf
+
     # Build Tranzila get_document URL (POST request, not GET!)
-    url = "https://billing5.tranzila.com/api/documents_db/get_document"
+    url = GET_DOCUMENT_URL
 
     # Prepare payload with terminal_name and document_id
     payload = {
@@ -279,37 +544,63 @@ def download_invoice_pdf(document_id: int) -> Optional[bytes]:
     }
 
     # Generate authentication headers
-    headers = generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
+    headers = _get_tranzila_headers()
 
     try:
         # Make authenticated POST request to Tranzila (not GET!)
-        logger.info(f"📡 Requesting PDF from Tranzila (POST): {url}")
-        logger.info(f"   Payload: {payload}")
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-
-        # Check response status
-        if response.status_code != 200:
-            logger.error(f"❌ Failed to download PDF: HTTP {response.status_code}")
-            logger.error(f"   Response: {response.text[:200]}")
-            return None
-
-        # Check if response is PDF
-        content_type = response.headers.get('Content-Type', '')
-        if 'pdf' not in content_type.lower():
-            logger.error(f"❌ Response is not a PDF (Content-Type: {content_type})")
-            logger.error(f"   Response preview: {response.text[:200]}")
-            return None
+        logger.info("📡 Requesting PDF from Tranzila (POST): %s", url)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("   Payload: %s", payload)
+        # Stream the body so the PDF is read in chunks into one buffer and
+        # an oversized upstream response is cut off instead of loaded whole
+        started_at = time.perf_counter()
+        with _get_session().post(url, data=orjson.dumps(payload), headers=headers,
+                                 timeout=PDF_DOWNLOAD_TIMEOUT, stream=True) as response:
+            observe_tranzila_request("get_document", response.status_code, started_at)
+
+            # Check response status
+            if response.status_code != 200:
+                logger.error("❌ Failed to download PDF: HTTP %s", response.status_code)
+                # Only the head of the (streamed) error body; .content would read all of it
+                logger.error("   Response: %s", next(response.iter_content(200), b"").decode('utf-8', 'replace'))
+                return None
+
+            # Check the body really is a PDF by its magic bytes as it streams in -
+            # Content-Type isn't reliable, and error bodies are rejected after the first chunk
+            buffer = io.BytesIO()
+            total = 0
+            magic_checked = False
+            for chunk in response.iter_content(chunk_size=PDF_DOWNLOAD_CHUNK_SIZE):
+                total += len(chunk)
+                if total > PDF_DOWNLOAD_MAX_BYTES:
+                    logger.error(f"❌ PDF exceeds {PDF_DOWNLOAD_MAX_BYTES} bytes, aborting download")
+                    return None
+                buffer.write(chunk)
+                if not magic_checked and total >= len(PDF_MAGIC):
+                    if not buffer.getvalue().startswith(PDF_MAGIC):
+                        logger.error(f"❌ Response is not a PDF (Content-Type: {response.headers.get('Content-Type', '')})")
+                        logger.error(f"   Response preview: {buffer.getvalue()[:200].decode('utf-8', 'replace')}")
+                        return None
+                    magic_checked = True
+
+            if not magic_checked:
+                logger.error(f"❌ Response is not a PDF ({total} bytes)")
+                return None
 
         # Return PDF binary content
-        pdf_size = len(response.content)
-        logger.info(f"✅ PDF downloaded successfully ({pdf_size} bytes)")
-        return response.content
+        pdf_content = buffer.getvalue()
+        logger.info(f"✅ PDF downloaded successfully ({len(pdf_content)} bytes)")
+        if len(pdf_content) <= PDF_CACHE_MAX_BYTES:
+            _PDF_CACHE.set(int(document_id), pdf_content)
+        return pdf_content
 
     except requests.exceptions.Timeout:
+        record_tranzila_error("get_document", "timeout")
         logger.error("❌ PDF download timed out after 30 seconds")
         return None
 
     except requests.exceptions.RequestException as e:
+        record_tranzila_error("get_document", "http")
         logger.error(f"❌ HTTP error downloading PDF: {str(e)}")
         return None
 
@@ -4,13 +4,25 @@ Handles sending beautiful HTML emails for payment confirmations, invoices, etc.
 """
 
 import os
+import re
+import asyncio
+import atexit
+import functools
 import logging
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from typing import Optional
+import queue
+import threading
+import time
+import email.policy
+from email.message import EmailMessage
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
+import jinja2
+from markupsafe import Markup
 from datetime import datetime
 
+if TYPE_CHECKING:
+    import smtplib
+
 logger = logging.getLogger(__name__)
 
 # SMTP Configuration from environment
@@ -18,9 +30,786 @@ SMTP_SERVER = os.getenv("SMTP_SERVER")
 SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 SMTP_USERNAME = os.getenv("SMTP_USERNAME")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+SMTP_TIMEOUT = 30
+# Implicit TLS (SMTPS) negotiates TLS with the TCP connect instead of an
+# EHLO/STARTTLS exchange afterwards; on by default for the SMTPS port
+SMTP_USE_SSL = os.getenv("SMTP_USE_SSL", str(SMTP_PORT == 465)).lower() in ("1", "true", "yes")
 
+# Deployments that must send email can refuse to start without SMTP settings
+SMTP_REQUIRED = os.getenv("SMTP_REQUIRED", "false").lower() in ("true", "1", "yes")
 
-def send_payment_success_email(
+# Resolved once at import - the env doesn't change while the process runs,
+# so the send paths only test this flag
+SMTP_CONFIGURED = bool(SMTP_SERVER and SMTP_PORT and SMTP_USERNAME and SMTP_PASSWORD)
+if not SMTP_CONFIGURED:
+    if SMTP_REQUIRED:
+        raise RuntimeError("SMTP_REQUIRED is set but SMTP_SERVER/SMTP_USERNAME/SMTP_PASSWORD are incomplete")
+    logger.warning("⚠️ SMTP configuration incomplete - emails will not be sent")
+# Idle SMTP sessions kept open for reuse (one per concurrent sender is enough)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", 4))
+# Rotate pooled connections before providers start dropping them
+SMTP_MAX_PER_CONNECTION = int(os.getenv("SMTP_MAX_PER_CONN", 500))
+SMTP_MAX_CONNECTION_AGE = int(os.getenv("SMTP_MAX_CONN_AGE", 300))  # seconds
+# Providers cap RCPT TO per message; bulk sends are split into batches of this size
+SMTP_MAX_RECIPIENTS = int(os.getenv("SMTP_MAX_RECIPIENTS", 50))
+
+
+class _SMTPConnection:
+    """
+    One authenticated SMTP connection, reused across sends via _SMTPConnectionPool.
+
+    Opening a session costs a TCP connect, STARTTLS and AUTH; keeping one open
+    lets back-to-back emails skip all three. The connection is checked with
+    NOOP before reuse and re-established if the server has dropped it, and it
+    is rotated after SMTP_MAX_PER_CONNECTION messages or SMTP_MAX_CONNECTION_AGE
+    seconds so provider per-connection limits and idle timeouts never hit mid-send.
+    """
+
+    def __init__(self):
+        self._server: Optional["smtplib.SMTP"] = None
+        self._lock = threading.Lock()
+        self.sent_count = 0
+        self._opened_at = 0.0
+
+    def _connect(self) -> "smtplib.SMTP":
+        # smtplib (and the ssl/socket setup behind it) is only loaded on first send
+        import smtplib
+        import ssl
+
+        logger.info("📡 Connecting to SMTP server: %s:%s", SMTP_SERVER, SMTP_PORT)
+        if SMTP_USE_SSL:
+            server = smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT,
+                                      context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        try:
+            # starttls() and login() send EHLO themselves when needed (smtplib
+            # tracks ehlo_resp and resets it after TLS), so no explicit EHLOs here
+            if not SMTP_USE_SSL:
+                server.starttls()
+            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _get_server(self) -> "smtplib.SMTP":
+        import smtplib
+
+        if self._server is not None and (
+            self.sent_count >= SMTP_MAX_PER_CONNECTION
+            or time.monotonic() - self._opened_at >= SMTP_MAX_CONNECTION_AGE
+        ):
+            logger.info("🔄 Rotating SMTP connection after %s messages", self.sent_count)
+            self._close_server()
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close_server()
+        self._server = self._connect()
+        self.sent_count = 0
+        self._opened_at = time.monotonic()
+        return self._server
+
+    def _close_server(self):
+        import smtplib
+
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def send_message(self, msg) -> dict:
+        """Send an EmailMessage over this connection (see _send)"""
+        return self._send(lambda server: server.send_message(msg))
+
+    def sendmail(self, from_addr: str, to_addrs: List[str], raw: bytes) -> dict:
+        """Send an already-serialized message to the given envelope recipients (see _send)"""
+        return self._send(lambda server: server.sendmail(from_addr, to_addrs, raw))
+
+    def _send(self, send) -> dict:
+        """
+        Run send(server) on this connection, reconnecting once on transient errors
+
+        A dropped session or failed connect is retried once on a fresh
+        connection; authentication and data errors are raised immediately
+        since another attempt would fail the same way.
+
+        Returns:
+            Recipients the server refused, as smtplib reports them ({} if none)
+        """
+        import smtplib
+
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    refused = send(self._get_server())
+                    break
+                except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                    self._close_server()
+                    if attempt:
+                        raise
+                    logger.warning("⚠️ SMTP connection lost (%s), retrying once", e)
+            self.sent_count += 1
+            return refused
+
+    def close(self):
+        """Quit the connection (it is reopened on the next send)"""
+        with self._lock:
+            self._close_server()
+
+
+class _SMTPConnectionPool:
+    """
+    Fixed set of SMTP connections handed out one sender at a time.
+
+    A single shared connection serializes concurrent sends behind its lock;
+    with a pool each sender thread gets its own session. Connections are
+    opened lazily on first use and handed out LIFO, so under light load the
+    same warm session keeps getting reused while the rest stay closed.
+    """
+
+    def __init__(self, size: int):
+        self._connections = [_SMTPConnection() for _ in range(max(1, size))]
+        self._idle: "queue.LifoQueue[_SMTPConnection]" = queue.LifoQueue()
+        for conn in self._connections:
+            self._idle.put(conn)
+
+    def get_connection(self) -> _SMTPConnection:
+        """Take an idle connection, waiting for one if all are in use"""
+        return self._idle.get()
+
+    def return_connection(self, conn: _SMTPConnection):
+        """Hand a connection back for the next sender"""
+        self._idle.put(conn)
+
+    def close(self):
+        """Quit every pooled connection (each waits for its in-flight send)"""
+        for conn in self._connections:
+            conn.close()
+
+
+_SMTP_POOL = _SMTPConnectionPool(SMTP_POOL_SIZE)
+atexit.register(_SMTP_POOL.close)
+
+def _send_via_smtp(msg) -> dict:
+    """Send a message over a pooled SMTP connection (single entry point for sync sends)"""
+    conn = _SMTP_POOL.get_connection()
+    try:
+        return conn.send_message(msg)
+    finally:
+        _SMTP_POOL.return_connection(conn)
+
+
+def _sendmail_via_smtp(to_addrs: List[str], raw: bytes) -> dict:
+    """Send pre-serialized message bytes to to_addrs over a pooled SMTP connection"""
+    conn = _SMTP_POOL.get_connection()
+    try:
+        return conn.sendmail(SMTP_USERNAME, to_addrs, raw)
+    finally:
+        _SMTP_POOL.return_connection(conn)
+
+
+def _send_many_via_smtp(messages: List[EmailMessage]) -> List[bool]:
+    """
+    Send several messages back to back over one pooled SMTP connection
+
+    Returns:
+        One success flag per message, in order. An authentication failure
+        marks the rest as failed without trying them.
+    """
+    import smtplib
+
+    results: List[bool] = []
+    conn = _SMTP_POOL.get_connection()
+    try:
+        for msg in messages:
+            try:
+                conn.send_message(msg)
+                results.append(True)
+            except smtplib.SMTPAuthenticationError as e:
+                logger.error("❌ SMTP Authentication failed: %s", e)
+                break
+            except Exception as e:
+                logger.error("❌ Error sending email to %s: %s", msg["To"], e)
+                results.append(False)
+    finally:
+        _SMTP_POOL.return_connection(conn)
+    return results + [False] * (len(messages) - len(results))
+
+
+# Worker threads for fire-and-forget sends (wait=False), so HTTP handlers
+# don't block on SMTP. Registered after the SMTP pool so it drains first at exit.
+_EMAIL_POOL = ThreadPoolExecutor(max_workers=SMTP_POOL_SIZE, thread_name_prefix="smtp")
+atexit.register(_EMAIL_POOL.shutdown, wait=True)
+
+
+# HTML email templates: a static head per kind plus a Jinja2 body template,
+# compiled once at import and rendered per send. Variables are HTML-escaped on render.
+_HTML_HEAD = """
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+"""
+
+# Static stylesheets - plain strings, identical for every email of a kind
+_PAYMENT_SUCCESS_CSS = """
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            line-height: 1.6;
+            color: #e2e8f0;
+            background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
+            margin: 0;
+            padding: 0;
+        }
+        .email-wrapper {
+            max-width: 600px;
+            margin: 40px auto;
+            background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
+            border-radius: 16px;
+            overflow: hidden;
+            box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.3), 0 10px 10px -5px rgba(0, 0, 0, 0.2);
+            border: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .header {
+            background: rgba(0, 0, 0, 0.2);
+            backdrop-filter: blur(10px);
+            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+            color: white;
+            padding: 40px 30px;
+            text-align: center;
+        }
+        .header h1 {
+            margin: 0;
+            font-size: 32px;
+            font-weight: 700;
+            background: linear-gradient(135deg, #60a5fa 0%, #a78bfa 100%);
+            -webkit-background-clip: text;
+            -webkit-text-fill-color: transparent;
+            background-clip: text;
+        }
+        .header p {
+            margin: 10px 0 0 0;
+            font-size: 18px;
+            opacity: 0.9;
+            color: #cbd5e1;
+        }
+        .content {
+            padding: 40px 30px;
+            background: rgba(0, 0, 0, 0.1);
+            backdrop-filter: blur(20px);
+        }
+        .greeting {
+            font-size: 20px;
+            color: #ffffff;
+            margin-bottom: 20px;
+            font-weight: 600;
+        }
+        .message {
+            font-size: 16px;
+            color: #ffffff;
+            margin-bottom: 30px;
+            line-height: 1.8;
+        }
+        .plan-details {
+            background: linear-gradient(135deg, rgba(59, 130, 246, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%);
+            border: 1px solid rgba(139, 92, 246, 0.4);
+            border-left: 4px solid #8b5cf6;
+            padding: 25px;
+            margin: 30px 0;
+            border-radius: 12px;
+            backdrop-filter: blur(10px);
+            box-shadow: 0 8px 16px -4px rgba(139, 92, 246, 0.2);
+        }
+        .plan-details h2 {
+            margin: 0 0 20px 0;
+            color: #ffffff;
+            font-size: 22px;
+            font-weight: 700;
+        }
+        .detail-row {
+            display: flex;
+            justify-content: space-between;
+            padding: 12px 0;
+            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .detail-row:last-child {
+            border-bottom: none;
+        }
+        .detail-label {
+            font-weight: 600;
+            color: #ffffff;
+        }
+        .detail-value {
+            color: #ffffff;
+            font-weight: 700;
+        }
+        .features {
+            margin: 30px 0;
+            background: rgba(0, 0, 0, 0.2);
+            border-radius: 12px;
+            padding: 25px;
+            border: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .features h3 {
+            color: #ffffff;
+            font-size: 18px;
+            margin-bottom: 15px;
+            font-weight: 600;
+        }
+        .feature-item {
+            padding: 10px 0;
+            padding-left: 30px;
+            position: relative;
+            color: #ffffff;
+        }
+        .feature-item:before {
+            content: "✓";
+            position: absolute;
+            left: 0;
+            color: #60a5fa;
+            font-weight: bold;
+            font-size: 18px;
+        }
+        .cta-button {
+            display: inline-block;
+            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
+            color: #ffffff;
+            padding: 12px 32px;
+            text-decoration: none;
+            border-radius: 10px;
+            font-weight: 600;
+            font-size: 14px;
+            margin: 20px 0;
+            text-align: center;
+            box-shadow: 0 10px 15px -3px rgba(59, 130, 246, 0.3);
+            transition: all 0.3s ease;
+        }
+        .invoice-section {
+            background: rgba(30, 58, 138, 0.2);
+            border: 1px solid rgba(96, 165, 250, 0.2);
+            padding: 25px;
+            border-radius: 12px;
+            margin: 20px 0;
+            text-align: center;
+            backdrop-filter: blur(10px);
+        }
+        .invoice-button {
+            display: inline-block;
+            background: linear-gradient(135deg, #10b981 0%, #059669 100%);
+            color: #ffffff;
+            padding: 12px 30px;
+            text-decoration: none;
+            border-radius: 10px;
+            font-weight: 700;
+            margin-top: 10px;
+            box-shadow: 0 10px 20px -5px rgba(16, 185, 129, 0.4);
+            transition: all 0.3s ease;
+            text-transform: uppercase;
+            letter-spacing: 0.5px;
+            font-size: 14px;
+        }
+        .footer {
+            background: rgba(0, 0, 0, 0.3);
+            backdrop-filter: blur(10px);
+            padding: 30px;
+            text-align: center;
+            color: #94a3b8;
+            font-size: 14px;
+            border-top: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .footer a {
+            color: #60a5fa;
+            text-decoration: none;
+        }
+        .footer a:hover {
+            color: #93c5fd;
+        }
+        .transaction-id {
+            font-family: 'Courier New', monospace;
+            background: rgba(139, 92, 246, 0.15);
+            padding: 6px 12px;
+            border-radius: 6px;
+            font-size: 14px;
+            color: #c4b5fd;
+            border: 1px solid rgba(139, 92, 246, 0.3);
+        }
+"""
+
+_SUBSCRIPTION_CANCELLED_CSS = """
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+            line-height: 1.6;
+            color: #e2e8f0;
+            background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
+            margin: 0;
+            padding: 0;
+        }
+        .email-wrapper {
+            max-width: 600px;
+            margin: 40px auto;
+            background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
+            border-radius: 16px;
+            overflow: hidden;
+            box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.3), 0 10px 10px -5px rgba(0, 0, 0, 0.2);
+            border: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .header {
+            background: rgba(0, 0, 0, 0.2);
+            backdrop-filter: blur(10px);
+            border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+            color: white;
+            padding: 40px 30px;
+            text-align: center;
+        }
+        .header h2 {
+            margin: 0;
+            font-size: 28px;
+            font-weight: 700;
+            color: #ffffff;
+        }
+        .content {
+            padding: 40px 30px;
+            background: rgba(0, 0, 0, 0.1);
+            backdrop-filter: blur(20px);
+            color: #ffffff;
+        }
+        .content p {
+            margin-bottom: 20px;
+            font-size: 16px;
+            line-height: 1.8;
+        }
+        .content ul {
+            background: linear-gradient(135deg, rgba(59, 130, 246, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%);
+            border: 1px solid rgba(139, 92, 246, 0.4);
+            border-left: 4px solid #8b5cf6;
+            padding: 20px 20px 20px 40px;
+            margin: 20px 0;
+            border-radius: 12px;
+            list-style: none;
+            box-shadow: 0 8px 16px -4px rgba(139, 92, 246, 0.2);
+        }
+        .content ul li {
+            padding: 8px 0;
+            position: relative;
+            color: #ffffff;
+        }
+        .content ul li:before {
+            content: "•";
+            position: absolute;
+            left: -20px;
+            color: #a78bfa;
+            font-weight: bold;
+            font-size: 20px;
+        }
+        .cta-button {
+            display: inline-block;
+            background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
+            color: white;
+            padding: 16px 40px;
+            text-decoration: none;
+            border-radius: 10px;
+            font-weight: 700;
+            margin-top: 30px;
+            box-shadow: 0 10px 20px -5px rgba(59, 130, 246, 0.4);
+            transition: all 0.3s ease;
+            text-transform: uppercase;
+            letter-spacing: 0.5px;
+            font-size: 15px;
+        }
+        .footer {
+            background: rgba(0, 0, 0, 0.3);
+            backdrop-filter: blur(10px);
+            padding: 30px;
+            text-align: center;
+            color: #94a3b8;
+            font-size: 14px;
+            border-top: 1px solid rgba(255, 255, 255, 0.1);
+        }
+        .footer p {
+            margin: 5px 0;
+        }
+        .footer a {
+            color: #60a5fa;
+            text-decoration: none;
+        }
+        .footer a:hover {
+            color: #93c5fd;
+        }
+"""
+
+# Dynamic part of each email (Jinja2): everything after </head>
+_PAYMENT_SUCCESS_BODY = """</head>
+<body>
+    <div class="email-wrapper">
+        <!-- Header -->
+        <div class="header">
+            <h1>🎉 Payment Successful!</h1>
+            <p>Welcome to TalkAPI {{ plan_upper }}</p>
+        </div>
+
+        <!-- Content -->
+        <div class="content">
+            <div class="greeting">
+                Hi {{ user_name }},
+            </div>
+
+            <div class="message">
+                Thank you for upgrading to <strong>TalkAPI {{ plan_upper }}</strong>!
+                Your payment has been processed successfully, and your account has been upgraded.
+            </div>
+
+            <!-- Plan Details -->
+            <div class="plan-details">
+                <h2>📋 Payment Details</h2>
+                <div class="detail-row">
+                    <span class="detail-label">Plan</span>
+                    <span class="detail-value">TalkAPI Pro Monthly Subscription</span>
+                </div>
+                <div class="detail-row">
+                    <span class="detail-label">Amount Paid</span>
+                    <span class="detail-value">$ {{ amount }}</span>
+                </div>
+                <div class="detail-row">
+                    <span class="detail-label">Payment Date</span>
+                    <span class="detail-value">{{ payment_date }}</span>
+                </div>
+            </div>
+
+            {{ plan_features }}
+
+            {% if invoice_url %}
+            <!-- Invoice -->
+            <div class="invoice-section">
+                <h3 style="margin-top: 0; color: #ffffff; font-weight: 600;">📄 Your Invoice</h3>
+                <p style="color: #ffffff; margin-bottom: 15px;">
+                    Click below to download your invoice
+                </p>
+                <a href="{{ invoice_url }}" class="invoice-button" target="_blank">
+                    📥 Download PDF
+                </a>
+            </div>
+            {% endif %}
+
+            <!-- CTA Button -->
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="https://talkapi.ai/home" class="cta-button">
+                    Start Using TalkAPI →
+                </a>
+            </div>
+        </div>
+
+        <!-- Footer -->
+        <div class="footer">
+            <p style="margin: 0 0 10px 0;">
+                <strong style="color: #e2e8f0;">TalkAPI</strong> - AI-Powered API Integration
+            </p>
+            <p style="margin: 0 0 10px 0;">
+                <a href="https://talkapi.ai">talkapi.ai</a> |
+                <a href="https://talkapi.ai/account">My Account</a> |
+                <a href="mailto:{{ support_email }}">Support</a>
+            </p>
+            <p style="margin: 10px 0 0 0; font-size: 12px; color: #64748b;">
+                This email was sent to {{ user_email }} because you made a purchase on TalkAPI.
+            </p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# Plan features block of the payment email - rendered once per (plan, limits)
+# combination and spliced into the body, see _plan_features_html()
+_PLAN_FEATURES_BODY = """<!-- Features -->
+            <div class="features">
+                <h3>✨ Your {{ plan_upper }} Features</h3>
+                <div class="feature-item">
+                    <strong>{{ daily_limit }}</strong> API requests per day
+                </div>
+                <div class="feature-item">
+                    <strong>{{ monthly_limit }}</strong> API requests per month
+                </div>
+                <div class="feature-item">
+                    API history & favorites
+                </div>
+                <div class="feature-item">
+                    Priority email support
+                </div>
+            </div>"""
+
+_SUBSCRIPTION_CANCELLED_BODY = """</head>
+<body>
+    <div class="email-wrapper">
+        <div class="header">
+            <h2>Subscription Cancelled</h2>
+        </div>
+        <div class="content">
+            <p style="font-size: 18px; font-weight: 600; color: #ffffff;">Hi {{ user_name }},</p>
+            <p>Your TalkAPI Pro subscription has been successfully cancelled.</p>
+            <p>You have been reverted to the <strong style="color: #ffffff;">Free Plan</strong> with the following limits:</p>
+            <ul>
+                <li>50 API requests per day</li>
+                <li>500 API requests per month</li>
+                <li>Basic features</li>
+            </ul>
+            <p>We're sorry to see you go! If you change your mind, you can upgrade again anytime from your account dashboard.</p>
+            <p style="text-align: center;">
+                <a href="https://talkapi.ai/pricing" class="cta-button">
+                    View Plans
+                </a>
+            </p>
+        </div>
+        <div class="footer">
+            <p><strong style="color: #e2e8f0;">TalkAPI</strong> - AI-Powered API Integration</p>
+            <p><a href="https://talkapi.ai">talkapi.ai</a> | <a href="mailto:{{ support_email }}">Support</a></p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+
+def _minify_css(css: str) -> str:
+    """Collapse whitespace and drop optional separators so each email carries fewer CSS bytes"""
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def _page_head(css: str) -> str:
+    """Static document head: the shared <head> markup plus a minified stylesheet"""
+    return _HTML_HEAD + "    <style>" + _minify_css(css) + "</style>\n"
+
+
+# The head and stylesheet never vary, so they stay out of Jinja entirely and
+# are prepended to the rendered body; only the body template has bindings
+_PAYMENT_SUCCESS_HEAD = _page_head(_PAYMENT_SUCCESS_CSS)
+_SUBSCRIPTION_CANCELLED_HEAD = _page_head(_SUBSCRIPTION_CANCELLED_CSS)
+
+_JINJA_ENV = jinja2.Environment(
+    loader=jinja2.DictLoader({
+        "payment_success": _PAYMENT_SUCCESS_BODY,
+        "subscription_cancelled": _SUBSCRIPTION_CANCELLED_BODY,
+        "plan_features": _PLAN_FEATURES_BODY,
+    }),
+    # Template names carry no extension, so HTML escaping is also the default
+    autoescape=jinja2.select_autoescape(["html"], default_for_string=True, default=True),
+    cache_size=32,
+    # Sources are constants in this module - skip the per-lookup staleness check
+    auto_reload=False,
+    # Drop the tag lines themselves, so a skipped {% if invoice_url %} block
+    # leaves no stray indentation/newlines behind
+    trim_blocks=True,
+    lstrip_blocks=True,
+)
+
+# Compiled Template objects, resolved once so sends skip the environment lookup
+_PAYMENT_SUCCESS_TEMPLATE = _JINJA_ENV.get_template("payment_success")
+_SUBSCRIPTION_CANCELLED_TEMPLATE = _JINJA_ENV.get_template("subscription_cancelled")
+_PLAN_FEATURES_TEMPLATE = _JINJA_ENV.get_template("plan_features")
+
+
+@functools.lru_cache(maxsize=32)
+def _plan_features_html(plan_upper: str, daily_limit: int, monthly_limit: int) -> Markup:
+    """Rendered features block for a plan - there are only a few distinct plan/limit combinations"""
+    return Markup(_PLAN_FEATURES_TEMPLATE.render(
+        plan_upper=plan_upper,
+        daily_limit=daily_limit,
+        monthly_limit=monthly_limit,
+    ))
+
+
+# Warm the cache for the plan every upgrade currently sells
+_plan_features_html("PRO", 100, 2000)
+
+
+def _qp_encode(text: str) -> str:
+    """Quoted-printable encode UTF-8 text exactly as EmailMessage.set_content does"""
+    part = EmailMessage()
+    part.set_content(text, subtype="html", cte="quoted-printable")
+    return part.get_payload()
+
+
+# QP encoding is line-based, so the static head (which ends on a newline) can
+# be encoded once and joined with the encoded body; only the body is encoded per send
+_PAYMENT_SUCCESS_HEAD_QP = _qp_encode(_PAYMENT_SUCCESS_HEAD)
+_SUBSCRIPTION_CANCELLED_HEAD_QP = _qp_encode(_SUBSCRIPTION_CANCELLED_HEAD)
+
+
+def _attach_html(msg: EmailMessage, head_qp: str, body_html: str):
+    """Add the HTML alternative from a pre-encoded head and a freshly rendered body"""
+    part = EmailMessage()
+    part["Content-Type"] = 'text/html; charset="utf-8"'
+    part["Content-Transfer-Encoding"] = "quoted-printable"
+    # set_content always ends text parts with a newline; keep that framing
+    part.set_payload(head_qp + _qp_encode(body_html + "\n"))
+    msg.make_alternative()
+    msg.attach(part)
+
+
+# Header values that repeat across sends - built once instead of per message
+_FROM_HEADER = f"TalkAPI <{SMTP_USERNAME}>"
+
+
+@functools.lru_cache(maxsize=8)
+def _subject_for(plan_upper: str) -> str:
+    """Payment confirmation subject for a plan (only a handful of plans exist)"""
+    return f"🎉 Welcome to TalkAPI {plan_upper} Plan!"
+
+
+def _build_payment_success_message(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    plan_type: str,
+    transaction_id: str,
+    invoice_url: Optional[str],
+    daily_limit: int,
+    monthly_limit: int
+) -> EmailMessage:
+    """Build the payment confirmation email message"""
+    # Normalized once and shared by the subject, template and plain-text part
+    plan_upper = plan_type.upper()
+
+    # Create email message
+    msg = EmailMessage()
+    msg["From"] = _FROM_HEADER
+    msg["To"] = user_email
+    msg["Subject"] = _subject_for(plan_upper)
+
+    # Format date
+    payment_date = datetime.now().strftime("%B %d, %Y at %I:%M %p")
+
+    html_body = _PAYMENT_SUCCESS_TEMPLATE.render(
+        user_name=user_name,
+        user_email=user_email,
+        plan_upper=plan_upper,
+        amount=f"{amount:.2f}",
+        payment_date=payment_date,
+        plan_features=_plan_features_html(plan_upper, daily_limit, monthly_limit),
+        invoice_url=invoice_url,
+        support_email=SMTP_USERNAME,
+    )
+
+    # Plain-text fallback first, HTML as the preferred alternative
+    msg.set_content(
+        f"Hi {user_name},\n\n"
+        f"Your payment was successful and your account has been upgraded to TalkAPI {plan_upper}.\n"
+        + (f"\nDownload your invoice: {invoice_url}\n" if invoice_url else "")
+    )
+    _attach_html(msg, _PAYMENT_SUCCESS_HEAD_QP, html_body)
+    return msg
+
+
+def _send_payment_success_email_sync(
     user_email: str,
     user_name: str,
     amount: float,
@@ -30,6 +819,57 @@ def send_payment_success_email(
     daily_limit: int = 100,
     monthly_limit: int = 2000
 ) -> bool:
+    """Send the payment confirmation email on the calling thread"""
+    import smtplib
+
+    logger.info("📧 Sending payment success email to %s", user_email)
+
+    # Validate SMTP configuration
+    if not SMTP_CONFIGURED:
+        logger.error("❌ SMTP configuration incomplete - cannot send email")
+        return False
+
+    try:
+        msg = _build_payment_success_message(
+            user_email, user_name, amount, plan_type, transaction_id,
+            invoice_url, daily_limit, monthly_limit
+        )
+
+        # Send email via the shared SMTP connection
+        logger.info("📤 Sending payment success email to: %s", user_email)
+        _send_via_smtp(msg)
+
+        logger.info("✅ Payment success email sent successfully to %s", user_email)
+        return True
+
+    except smtplib.SMTPAuthenticationError as e:
+        logger.error("❌ SMTP Authentication failed: %s", e)
+        return False
+
+    except smtplib.SMTPDataError as e:
+        logger.error("❌ SMTP server rejected the message, dropping it: %s", e)
+        return False
+
+    except smtplib.SMTPException as e:
+        logger.error("❌ SMTP error: %s", e)
+        return False
+
+    except Exception as e:
+        logger.error("❌ Unexpected error sending email: %s", e)
+        return False
+
+
+def send_payment_success_email(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    plan_type: str,
+    transaction_id: str,
+    invoice_url: Optional[str] = None,
+    daily_limit: int = 100,
+    monthly_limit: int = 2000,
+    wait: bool = True
+) -> Union[bool, Future]:
     """
     Send a beautiful payment confirmation email to the user
 
@@ -42,514 +882,302 @@ def send_payment_success_email(
         invoice_url: URL to invoice PDF (optional)
         daily_limit: Daily API request limit
         monthly_limit: Monthly API request limit
+        wait: If False, send on the background email pool and return immediately
 
     Returns:
         True if email sent successfully, False otherwise
+        (a Future resolving to that bool when wait=False)
     """
-    logger.info(f"📧 Sending payment success email to {user_email}")
+    args = (user_email, user_name, amount, plan_type, transaction_id, invoice_url, daily_limit, monthly_limit)
+    if wait:
+        return _send_payment_success_email_sync(*args)
+    return _EMAIL_POOL.submit(_send_payment_success_email_sync, *args)
 
-    # Validate SMTP configuration
-    if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
+
+def send_payment_success_emails(payments: List[dict]) -> List[bool]:
+    """
+    Send several payment confirmation emails over one SMTP connection
+
+    Each email is still rendered for its own recipient; batching only saves
+    taking a connection from the pool per message.
+
+    Args:
+        payments: One dict per email with send_payment_success_email's keyword
+                  arguments (user_email, user_name, amount, plan_type, ...)
+
+    Returns:
+        One success flag per payment, in order
+    """
+    logger.info("📧 Sending %s payment success emails (bulk)", len(payments))
+
+    if not SMTP_CONFIGURED:
         logger.error("❌ SMTP configuration incomplete - cannot send email")
-        return False
+        return [False] * len(payments)
 
-    try:
-        # Create email message
-        msg = MIMEMultipart("alternative")
-        msg["From"] = f"TalkAPI <{SMTP_USERNAME}>"
-        msg["To"] = user_email
-        msg["Subject"] = f"🎉 Welcome to TalkAPI {plan_type.upper()} Plan!"
-
-        # Format date
-        payment_date = datetime.now().strftime("%B %d, %Y at %I:%M %p")
-
-        # Create beautiful HTML email matching website design
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                body {{
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #e2e8f0;
-                    background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
-                    margin: 0;
-                    padding: 0;
-                }}
-                .email-wrapper {{
-                    max-width: 600px;
-                    margin: 40px auto;
-                    background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
-                    border-radius: 16px;
-                    overflow: hidden;
-                    box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.3), 0 10px 10px -5px rgba(0, 0, 0, 0.2);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .header {{
-                    background: rgba(0, 0, 0, 0.2);
-                    backdrop-filter: blur(10px);
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                    color: white;
-                    padding: 40px 30px;
-                    text-align: center;
-                }}
-                .header h1 {{
-                    margin: 0;
-                    font-size: 32px;
-                    font-weight: 700;
-                    background: linear-gradient(135deg, #60a5fa 0%, #a78bfa 100%);
-                    -webkit-background-clip: text;
-                    -webkit-text-fill-color: transparent;
-                    background-clip: text;
-                }}
-                .header p {{
-                    margin: 10px 0 0 0;
-                    font-size: 18px;
-                    opacity: 0.9;
-                    color: #cbd5e1;
-                }}
-                .content {{
-                    padding: 40px 30px;
-                    background: rgba(0, 0, 0, 0.1);
-                    backdrop-filter: blur(20px);
-                }}
-                .greeting {{
-                    font-size: 20px;
-                    color: #ffffff;
-                    margin-bottom: 20px;
-                    font-weight: 600;
-                }}
-                .message {{
-                    font-size: 16px;
-                    color: #ffffff;
-                    margin-bottom: 30px;
-                    line-height: 1.8;
-                }}
-                .plan-details {{
-                    background: linear-gradient(135deg, rgba(59, 130, 246, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%);
-                    border: 1px solid rgba(139, 92, 246, 0.4);
-                    border-left: 4px solid #8b5cf6;
-                    padding: 25px;
-                    margin: 30px 0;
-                    border-radius: 12px;
-                    backdrop-filter: blur(10px);
-                    box-shadow: 0 8px 16px -4px rgba(139, 92, 246, 0.2);
-                }}
-                .plan-details h2 {{
-                    margin: 0 0 20px 0;
-                    color: #ffffff;
-                    font-size: 22px;
-                    font-weight: 700;
-                }}
-                .detail-row {{
-                    display: flex;
-                    justify-content: space-between;
-                    padding: 12px 0;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .detail-row:last-child {{
-                    border-bottom: none;
-                }}
-                .detail-label {{
-                    font-weight: 600;
-                    color: #ffffff;
-                }}
-                .detail-value {{
-                    color: #ffffff;
-                    font-weight: 700;
-                }}
-                .features {{
-                    margin: 30px 0;
-                    background: rgba(0, 0, 0, 0.2);
-                    border-radius: 12px;
-                    padding: 25px;
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .features h3 {{
-                    color: #ffffff;
-                    font-size: 18px;
-                    margin-bottom: 15px;
-                    font-weight: 600;
-                }}
-                .feature-item {{
-                    padding: 10px 0;
-                    padding-left: 30px;
-                    position: relative;
-                    color: #ffffff;
-                }}
-                .feature-item:before {{
-                    content: "✓";
-                    position: absolute;
-                    left: 0;
-                    color: #60a5fa;
-                    font-weight: bold;
-                    font-size: 18px;
-                }}
-                .cta-button {{
-                    display: inline-block;
-                    background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-                    color: #ffffff;
-                    padding: 12px 32px;
-                    text-decoration: none;
-                    border-radius: 10px;
-                    font-weight: 600;
-                    font-size: 14px;
-                    margin: 20px 0;
-                    text-align: center;
-                    box-shadow: 0 10px 15px -3px rgba(59, 130, 246, 0.3);
-                    transition: all 0.3s ease;
-                }}
-                .invoice-section {{
-                    background: rgba(30, 58, 138, 0.2);
-                    border: 1px solid rgba(96, 165, 250, 0.2);
-                    padding: 25px;
-                    border-radius: 12px;
-                    margin: 20px 0;
-                    text-align: center;
-                    backdrop-filter: blur(10px);
-                }}
-                .invoice-button {{
-                    display: inline-block;
-                    background: linear-gradient(135deg, #10b981 0%, #059669 100%);
-                    color: #ffffff;
-                    padding: 12px 30px;
-                    text-decoration: none;
-                    border-radius: 10px;
-                    font-weight: 700;
-                    margin-top: 10px;
-                    box-shadow: 0 10px 20px -5px rgba(16, 185, 129, 0.4);
-                    transition: all 0.3s ease;
-                    text-transform: uppercase;
-                    letter-spacing: 0.5px;
-                    font-size: 14px;
-                }}
-                .footer {{
-                    background: rgba(0, 0, 0, 0.3);
-                    backdrop-filter: blur(10px);
-                    padding: 30px;
-                    text-align: center;
-                    color: #94a3b8;
-                    font-size: 14px;
-                    border-top: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .footer a {{
-                    color: #60a5fa;
-                    text-decoration: none;
-                }}
-                .footer a:hover {{
-                    color: #93c5fd;
-                }}
-                .transaction-id {{
-                    font-family: 'Courier New', monospace;
-                    background: rgba(139, 92, 246, 0.15);
-                    padding: 6px 12px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                    color: #c4b5fd;
-                    border: 1px solid rgba(139, 92, 246, 0.3);
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="email-wrapper">
-                <!-- Header -->
-                <div class="header">
-                    <h1>🎉 Payment Successful!</h1>
-                    <p>Welcome to TalkAPI {plan_type.upper()}</p>
-                </div>
+    messages = [
+        _build_payment_success_message(
+            p["user_email"], p["user_name"], p["amount"], p["plan_type"], p["transaction_id"],
+            p.get("invoice_url"), p.get("daily_limit", 100), p.get("monthly_limit", 2000)
+        )
+        for p in payments
+    ]
+    results = _send_many_via_smtp(messages)
 
-                <!-- Content -->
-                <div class="content">
-                    <div class="greeting">
-                        Hi {user_name},
-                    </div>
-
-                    <div class="message">
-                        Thank you for upgrading to <strong>TalkAPI {plan_type.upper()}</strong>!
-                        Your payment has been processed successfully, and your account has been upgraded.
-                    </div>
-
-                    <!-- Plan Details -->
-                    <div class="plan-details">
-                        <h2>📋 Payment Details</h2>
-                        <div class="detail-row">
-                            <span class="detail-label">Plan</span>
-                            <span class="detail-value">TalkAPI Pro Monthly Subscription</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Amount Paid</span>
-                            <span class="detail-value">$ {amount:.2f}</span>
-                        </div>
-                        <div class="detail-row">
-                            <span class="detail-label">Payment Date</span>
-                            <span class="detail-value">{payment_date}</span>
-                        </div>
-                    </div>
-
-                    <!-- Features -->
-                    <div class="features">
-                        <h3>✨ Your {plan_type.upper()} Features</h3>
-                        <div class="feature-item">
-                            <strong>{daily_limit}</strong> API requests per day
-                        </div>
-                        <div class="feature-item">
-                            <strong>{monthly_limit}</strong> API requests per month
-                        </div>
-                        <div class="feature-item">
-                            API history & favorites
-                        </div>
-                        <div class="feature-item">
-                            Priority email support
-                        </div>
-                    </div>
-
-                    {f'''
-                    <!-- Invoice -->
-                    <div class="invoice-section">
-                        <h3 style="margin-top: 0; color: #ffffff; font-weight: 600;">📄 Your Invoice</h3>
-                        <p style="color: #ffffff; margin-bottom: 15px;">
-                            Click below to download your invoice
-                        </p>
-                        <a href="{invoice_url}" class="invoice-button" target="_blank">
-                            📥 Download PDF
-                        </a>
-                    </div>
-                    ''' if invoice_url else ''}
-
-                    <!-- CTA Button -->
-                    <div style="text-align: center; margin: 30px 0;">
-                        <a href="https://talkapi.ai/home" class="cta-button">
-                            Start Using TalkAPI →
-                        </a>
-                    </div>
-                </div>
+    logger.info("✅ Payment success emails sent: %s/%s", sum(results), len(payments))
+    return results
 
-                <!-- Footer -->
-                <div class="footer">
-                    <p style="margin: 0 0 10px 0;">
-                        <strong style="color: #e2e8f0;">TalkAPI</strong> - AI-Powered API Integration
-                    </p>
-                    <p style="margin: 0 0 10px 0;">
-                        <a href="https://talkapi.ai">talkapi.ai</a> |
-                        <a href="https://talkapi.ai/account">My Account</a> |
-                        <a href="mailto:{SMTP_USERNAME}">Support</a>
-                    </p>
-                    <p style="margin: 10px 0 0 0; font-size: 12px; color: #64748b;">
-                        This email was sent to {user_email} because you made a purchase on TalkAPI.
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
 
-        # Attach HTML body
-        msg.attach(MIMEText(html_body, "html"))
+def _build_subscription_cancelled_message(user_email: str, user_name: str) -> EmailMessage:
+    """Build the subscription cancellation email message"""
+    msg = EmailMessage()
+    msg["From"] = _FROM_HEADER
+    msg["To"] = user_email
+    msg["Subject"] = "Your TalkAPI Subscription Has Been Cancelled"
 
-        # Send email via SMTP
-        logger.info(f"📡 Connecting to SMTP server: {SMTP_SERVER}:{SMTP_PORT}")
+    html_body = _SUBSCRIPTION_CANCELLED_TEMPLATE.render(
+        user_name=user_name,
+        support_email=SMTP_USERNAME,
+    )
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    msg.set_content(
+        f"Hi {user_name},\n\n"
+        "Your TalkAPI Pro subscription has been cancelled and your account was reverted to the Free Plan.\n"
+    )
+    _attach_html(msg, _SUBSCRIPTION_CANCELLED_HEAD_QP, html_body)
+    return msg
 
-            logger.info(f"📤 Sending payment success email to: {user_email}")
-            server.send_message(msg)
 
-        logger.info(f"✅ Payment success email sent successfully to {user_email}")
-        return True
+def _send_subscription_cancelled_email_sync(user_email: str, user_name: str) -> bool:
+    """Send the cancellation email on the calling thread"""
+    logger.info("📧 Sending cancellation email to %s", user_email)
 
-    except smtplib.SMTPAuthenticationError as e:
-        logger.error(f"❌ SMTP Authentication failed: {e}")
+    if not SMTP_CONFIGURED:
+        logger.error("❌ SMTP configuration incomplete")
         return False
 
-    except smtplib.SMTPException as e:
-        logger.error(f"❌ SMTP error: {e}")
-        return False
+    try:
+        msg = _build_subscription_cancelled_message(user_email, user_name)
+        _send_via_smtp(msg)
+
+        logger.info("✅ Cancellation email sent to %s", user_email)
+        return True
 
     except Exception as e:
-        logger.error(f"❌ Unexpected error sending email: {e}")
+        logger.error("❌ Error sending cancellation email: %s", e)
         return False
 
 
-def send_subscription_cancelled_email(user_email: str, user_name: str) -> bool:
+def send_subscription_cancelled_email(user_email: str, user_name: str, wait: bool = True) -> Union[bool, Future]:
     """
     Send email when user cancels their subscription
 
     Args:
         user_email: Customer email
         user_name: Customer name
+        wait: If False, send on the background email pool and return immediately
 
     Returns:
-        True if sent successfully
+        True if sent successfully (a Future resolving to that bool when wait=False)
     """
-    logger.info(f"📧 Sending cancellation email to {user_email}")
+    if wait:
+        return _send_subscription_cancelled_email_sync(user_email, user_name)
+    return _EMAIL_POOL.submit(_send_subscription_cancelled_email_sync, user_email, user_name)
+
+
+def send_subscription_cancelled_email_bulk(user_emails: List[str], user_name: str = "there") -> List[bool]:
+    """
+    Send the same cancellation email to many users with one DATA per batch
+
+    The message is rendered and serialized once with a shared greeting, then
+    each batch of up to SMTP_MAX_RECIPIENTS addresses is passed only as
+    envelope recipients (like Bcc), so the body is transferred once per batch
+    instead of once per recipient and recipients don't see each other.
 
-    if not all([SMTP_SERVER, SMTP_PORT, SMTP_USERNAME, SMTP_PASSWORD]):
+    Args:
+        user_emails: Customer email addresses
+        user_name: Name used in the greeting for every recipient
+
+    Returns:
+        One success flag per address, in order
+    """
+    logger.info("📧 Sending cancellation email to %s recipients (bulk)", len(user_emails))
+
+    if not SMTP_CONFIGURED:
         logger.error("❌ SMTP configuration incomplete")
+        return [False] * len(user_emails)
+
+    # The message bytes are identical for every batch; only the envelope changes.
+    # policy.SMTP gives the CRLF line endings smtplib would otherwise re-generate per send
+    msg = _build_subscription_cancelled_message(SMTP_USERNAME, user_name)
+    raw = msg.as_bytes(policy=email.policy.SMTP)
+    results: List[bool] = []
+    for start in range(0, len(user_emails), SMTP_MAX_RECIPIENTS):
+        batch = user_emails[start:start + SMTP_MAX_RECIPIENTS]
+        try:
+            refused = _sendmail_via_smtp(batch, raw)
+            results.extend(addr not in refused for addr in batch)
+        except Exception as e:
+            logger.error("❌ Error sending bulk cancellation email: %s", e)
+            results.extend([False] * len(batch))
+
+    logger.info("✅ Cancellation email sent to %s/%s recipients", sum(results), len(user_emails))
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Async senders (aiosmtplib) - for callers running inside an event loop.
+# Sends share one authenticated session per event loop, so the loop is never
+# blocked on SMTP and back-to-back emails skip the connect/STARTTLS/AUTH handshake.
+# ---------------------------------------------------------------------------
+
+class _AsyncSMTPConnection:
+    """
+    aiosmtplib session shared by async sends, serialized with an asyncio.Lock.
+
+    asyncio connections and locks belong to the loop that created them, so the
+    session is re-established when called from a different loop (e.g. a new
+    asyncio.run()). A dropped session is reconnected and the send retried once.
+    """
+
+    def __init__(self):
+        self._smtp = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _bind_loop(self):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._smtp is not None:
+                # Drop the previous loop's socket; that loop may already be closed,
+                # in which case there is nothing left to clean up
+                try:
+                    self._smtp.close()
+                except Exception as e:
+                    logger.debug("Closing stale SMTP session failed: %s", e)
+            self._loop = loop
+            self._smtp = None
+            self._lock = asyncio.Lock()
+
+    async def _get_smtp(self):
+        import aiosmtplib
+
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+        logger.info("📡 Connecting to SMTP server (async): %s:%s", SMTP_SERVER, SMTP_PORT)
+        smtp = aiosmtplib.SMTP(
+            hostname=SMTP_SERVER,
+            port=SMTP_PORT,
+            username=SMTP_USERNAME,
+            password=SMTP_PASSWORD,
+            use_tls=SMTP_USE_SSL,
+            start_tls=not SMTP_USE_SSL,
+            timeout=SMTP_TIMEOUT,
+        )
+        # connect() runs TLS setup and AUTH since credentials were given
+        await smtp.connect()
+        self._smtp = smtp
+        return smtp
+
+    async def send_message(self, msg):
+        import aiosmtplib
+
+        self._bind_loop()
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    return await (await self._get_smtp()).send_message(msg)
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError) as e:
+                    self._smtp = None
+                    if attempt:
+                        raise
+                    logger.warning("⚠️ SMTP connection lost (%s), retrying once", e)
+
+
+_async_smtp_connection = _AsyncSMTPConnection()
+
+
+async def _send_message_async(msg) -> None:
+    await _async_smtp_connection.send_message(msg)
+
+
+async def send_payment_success_email_async(
+    user_email: str,
+    user_name: str,
+    amount: float,
+    plan_type: str,
+    transaction_id: str,
+    invoice_url: Optional[str] = None,
+    daily_limit: int = 100,
+    monthly_limit: int = 2000
+) -> bool:
+    """
+    Async version of send_payment_success_email (same arguments and result)
+    """
+    import aiosmtplib
+
+    logger.info("📧 Sending payment success email (async) to %s", user_email)
+
+    if not SMTP_CONFIGURED:
+        logger.error("❌ SMTP configuration incomplete - cannot send email")
         return False
 
     try:
-        msg = MIMEMultipart("alternative")
-        msg["From"] = f"TalkAPI <{SMTP_USERNAME}>"
-        msg["To"] = user_email
-        msg["Subject"] = "Your TalkAPI Subscription Has Been Cancelled"
-
-        html_body = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <style>
-                body {{
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
-                    line-height: 1.6;
-                    color: #e2e8f0;
-                    background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
-                    margin: 0;
-                    padding: 0;
-                }}
-                .email-wrapper {{
-                    max-width: 600px;
-                    margin: 40px auto;
-                    background: linear-gradient(135deg, #0f172a 0%, #1e3a8a 50%, #581c87 100%);
-                    border-radius: 16px;
-                    overflow: hidden;
-                    box-shadow: 0 20px 25px -5px rgba(0, 0, 0, 0.3), 0 10px 10px -5px rgba(0, 0, 0, 0.2);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .header {{
-                    background: rgba(0, 0, 0, 0.2);
-                    backdrop-filter: blur(10px);
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                    color: white;
-                    padding: 40px 30px;
-                    text-align: center;
-                }}
-                .header h2 {{
-                    margin: 0;
-                    font-size: 28px;
-                    font-weight: 700;
-                    color: #ffffff;
-                }}
-                .content {{
-                    padding: 40px 30px;
-                    background: rgba(0, 0, 0, 0.1);
-                    backdrop-filter: blur(20px);
-                    color: #ffffff;
-                }}
-                .content p {{
-                    margin-bottom: 20px;
-                    font-size: 16px;
-                    line-height: 1.8;
-                }}
-                .content ul {{
-                    background: linear-gradient(135deg, rgba(59, 130, 246, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%);
-                    border: 1px solid rgba(139, 92, 246, 0.4);
-                    border-left: 4px solid #8b5cf6;
-                    padding: 20px 20px 20px 40px;
-                    margin: 20px 0;
-                    border-radius: 12px;
-                    list-style: none;
-                    box-shadow: 0 8px 16px -4px rgba(139, 92, 246, 0.2);
-                }}
-                .content ul li {{
-                    padding: 8px 0;
-                    position: relative;
-                    color: #ffffff;
-                }}
-                .content ul li:before {{
-                    content: "•";
-                    position: absolute;
-                    left: -20px;
-                    color: #a78bfa;
-                    font-weight: bold;
-                    font-size: 20px;
-                }}
-                .cta-button {{
-                    display: inline-block;
-                    background: linear-gradient(135deg, #3b82f6 0%, #8b5cf6 100%);
-                    color: white;
-                    padding: 16px 40px;
-                    text-decoration: none;
-                    border-radius: 10px;
-                    font-weight: 700;
-                    margin-top: 30px;
-                    box-shadow: 0 10px 20px -5px rgba(59, 130, 246, 0.4);
-                    transition: all 0.3s ease;
-                    text-transform: uppercase;
-                    letter-spacing: 0.5px;
-                    font-size: 15px;
-                }}
-                .footer {{
-                    background: rgba(0, 0, 0, 0.3);
-                    backdrop-filter: blur(10px);
-                    padding: 30px;
-                    text-align: center;
-                    color: #94a3b8;
-                    font-size: 14px;
-                    border-top: 1px solid rgba(255, 255, 255, 0.1);
-                }}
-                .footer p {{
-                    margin: 5px 0;
-                }}
-                .footer a {{
-                    color: #60a5fa;
-                    text-decoration: none;
-                }}
-                .footer a:hover {{
-                    color: #93c5fd;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="email-wrapper">
-                <div class="header">
-                    <h2>Subscription Cancelled</h2>
-                </div>
-                <div class="content">
-                    <p style="font-size: 18px; font-weight: 600; color: #ffffff;">Hi {user_name},</p>
-                    <p>Your TalkAPI Pro subscription has been successfully cancelled.</p>
-                    <p>You have been reverted to the <strong style="color: #ffffff;">Free Plan</strong> with the following limits:</p>
-                    <ul>
-                        <li>50 API requests per day</li>
-                        <li>500 API requests per month</li>
-                        <li>Basic features</li>
-                    </ul>
-                    <p>We're sorry to see you go! If you change your mind, you can upgrade again anytime from your account dashboard.</p>
-                    <p style="text-align: center;">
-                        <a href="https://talkapi.ai/pricing" class="cta-button">
-                            View Plans
-                        </a>
-                    </p>
-                </div>
-                <div class="footer">
-                    <p><strong style="color: #e2e8f0;">TalkAPI</strong> - AI-Powered API Integration</p>
-                    <p><a href="https://talkapi.ai">talkapi.ai</a> | <a href="mailto:{SMTP_USERNAME}">Support</a></p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        msg = _build_payment_success_message(
+            user_email, user_name, amount, plan_type, transaction_id,
+            invoice_url, daily_limit, monthly_limit
+        )
+        await _send_message_async(msg)
+        logger.info("✅ Payment success email sent successfully to %s", user_email)
+        return True
 
-        msg.attach(MIMEText(html_body, "html"))
+    except aiosmtplib.SMTPAuthenticationError as e:
+        logger.error("❌ SMTP Authentication failed: %s", e)
+        return False
 
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.ehlo()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+    except aiosmtplib.SMTPException as e:
+        logger.error("❌ SMTP error: %s", e)
+        return False
+
+    except Exception as e:
+        logger.error("❌ Unexpected error sending email: %s", e)
+        return False
+
+
+async def send_subscription_cancelled_email_async(user_email: str, user_name: str) -> bool:
+    """
+    Async version of send_subscription_cancelled_email (same arguments and result)
+    """
+    logger.info("📧 Sending cancellation email (async) to %s", user_email)
+
+    if not SMTP_CONFIGURED:
+        logger.error("❌ SMTP configuration incomplete")
+        return False
 
-        logger.info(f"✅ Cancellation email sent to {user_email}")
+    try:
+        msg = _build_subscription_cancelled_message(user_email, user_name)
+        await _send_message_async(msg)
+        logger.info("✅ Cancellation email sent to %s", user_email)
         return True
 
     except Exception as e:
-        logger.error(f"❌ Error sending cancellation email: {e}")
+        logger.error("❌ Error sending cancellation email: %s", e)
         return False
+
+
+async def send_subscription_cancelled_emails_async(recipients: List[Tuple[str, str]]) -> List[bool]:
+    """
+    Send cancellation emails to many users over the shared SMTP session
+
+    Sends go out one after another (the session is serialized), but only the
+    first one pays for connect/STARTTLS/AUTH.
+
+    Args:
+        recipients: List of (user_email, user_name) pairs
+
+    Returns:
+        One success flag per recipient, in order
+    """
+    return [
+        await send_subscription_cancelled_email_async(user_email, user_name)
+        for user_email, user_name in recipients
+    ]
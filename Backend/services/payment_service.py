@@ -1,11 +1,18 @@
+import asyncio
 from datetime import date
+from functools import lru_cache
 import logging
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
 
-from dateutil.relativedelta import relativedelta
-from flask import jsonify, request
+import httpx
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import os
-from .tranzila_service import generate_tranzila_headers
+from .tranzila_service import HTTP2_AVAILABLE, generate_tranzila_headers
 
 logger = logging.getLogger(__name__)
 
@@ -13,48 +20,254 @@ TRANZILA_SUPPLIER = os.getenv("TRANZILA_SUPPLIER")
 TRANZILA_PUBLIC_API_KEY = os.getenv("TRANZILA_PUBLIC_API_KEY")
 TRANZILA_SECRET_API_KEY = os.getenv("TRANZILA_SECRET_API_KEY")
 
+STO_CREATE_URL = "https://api.tranzila.com/v2/sto/create"
+# (connect, read) seconds for Tranzila API calls
+TRANZILA_API_TIMEOUT = (3.05, 10)
+
+# Shared HTTP session for api.tranzila.com, so consecutive standing-order
+# creations reuse a pooled TCP/TLS connection instead of re-handshaking.
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def _get_session() -> requests.Session:
+    """
+    Return the module-level Tranzila API session, creating it on first use.
+
+    Created lazily (under a lock) so each gunicorn worker builds its own
+    session after fork rather than sharing sockets with the master process.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                session = requests.Session()
+                # Only retry failures to connect, where the request never reached
+                # Tranzila - replaying sto/create could set up a duplicate standing order
+                session.mount("https://", HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=32,
+                    max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+                ))
+                _SESSION = session
+    return _SESSION
+
+# Static parts of the STO create payload, built once at import.
+# format_payload_recurring merges these with the per-call fields; the items
+# dict is copied on every call, so the templates are never mutated.
+_BASE_STO_PAYLOAD = {
+    "terminal_name": TRANZILA_SUPPLIER,  # Required [STOV2: line 11-12]
+    "sto_payments_number": 99,  # Required, max 9999 [STOV2: lines 13-17]
+    "charge_frequency": "monthly",  # Required, enum value [STOV2: lines 18-26]
+    "currency_code": "USD",  # Optional, default USD [STOV2: lines 29-37]
+    # שפת תגובה (אופציונלי) [STOV2: lines 58-59, 242-251]
+    "response_language": "english",
+}
+
+_STO_ITEM = {
+    "name": "Monthly TalkAPI Subscription",  # Required [STOV2: line 160]
+    "unit_price": 19.00,  # Required, min 0.01 max 99999 [STOV2: lines 135-140]
+    "units_number": 1,  # Optional, default 1 [STOV2: lines 141-146]
+    "price_currency": "USD",  # Optional, enum ILS/USD/EUR [STOV2: lines 147-150, 162-171]
+    "price_type": "G",  # Optional, G=Gross/N=Net [STOV2: lines 151-152, 172-184]
+    "vat_percent": 0  # Optional, no VAT for USD [STOV2: lines 153-158]
+}
+
+
+# Separator lines for the DEBUG payload dumps
+_BAR_EQ = "=" * 80
+_BAR_DASH = "-" * 80
+
+# Separators users type inside card numbers, removed in one translate() pass
+_CARD_NUMBER_STRIP = str.maketrans("", "", " -")
+_CARD_NUMBER_RE = re.compile(r"[0-9]{13,19}")
+_CVV_RE = re.compile(r"[0-9]{3,4}")
+
+
+@lru_cache(maxsize=4096)
+def _normalize_expiry(expire_month, expire_year) -> Tuple[int, int]:
+    """
+    Coerce card expiry to ints and expand a 2-digit year to 4 digits
+
+    Cached because recurring charges keep presenting the same few expiries;
+    invalid input raises and is not cached.
+
+    Raises:
+        ValueError: If the year is outside 2020-2099
+    """
+    year = int(expire_year)
+    year += 2000 * (year < 100)  # 2-digit year -> 20YY
+
+    # בדיקה שהשנה בטווח סביר (2020-2099)
+    # הערה: STOV2 line 201-202 מציין 2030 כדוגמה, לא כהגבלה קשיחה
+    # מאפשרים עד 2099 כדי לא לחסום כרטיסים תקפים
+    if year < 2020 or year > 2099:
+        logger.error("❌ Invalid expire_year: %s. Must be between 2020-2099", year)
+        raise ValueError(f"Expiry year must be between 2020-2099, got {year}")
+
+    return int(expire_month), year
+
+
+# Error bodies are logged, not parsed - cap how much is decoded
+ERROR_BODY_LOG_BYTES = 2048
+
+
+def _error_body(response) -> str:
+    """First ERROR_BODY_LOG_BYTES of a response body, decoded leniently for logging"""
+    return response.content[:ERROR_BODY_LOG_BYTES].decode("utf-8", "replace")
+
+
 def create_recurring_payment(token, expire_month, expire_year, full_name, user_email=None, user_id=None):
     logger.info("🔄 Starting recurring payment creation")
-    logger.info(f"📝 Token: {token[:10]}..." if token else "No token")
-    logger.info(f"📅 Expiry: {expire_month}/{expire_year}")
-    logger.info(f"👤 Full name: {full_name}")
-    logger.info(f"📧 Email: {user_email}")
-    logger.info(f"🆔 User ID: {user_id}")
-    
-    url = "https://api.tranzila.com/v2/sto/create"
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📝 Token: %s...", token[:10] if token else "None")
+        logger.debug("📅 Expiry: %s/%s", expire_month, expire_year)
+        logger.debug("👤 Full name: %s", full_name)
+        logger.debug("📧 Email: %s", user_email)
+        logger.debug("🆔 User ID: %s", user_id)
+
+    url = STO_CREATE_URL
 
     payload = format_payload_recurring(token, expire_month, expire_year, full_name, user_email, user_id)
     headers = generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
     
-    logger.info(f"🔍 Recurring Payment URL: {url}")
-    logger.info(f"🔍 Recurring Payment Payload: {payload}")
-    logger.info(f"🔍 Recurring Payment Headers: {headers}")
+    logger.debug("🔍 Recurring Payment URL: %s", url)
+    logger.debug("🔍 Recurring Payment Payload: %s", payload)
 
     try:
         logger.info("📡 Making request to Tranzila API...")
-        response = requests.post(url, json=payload, headers=headers)
-        logger.info(f"📡 Recurring Payment Response Status: {response.status_code}")
-        
+        # headers already carry Content-Type: application/json
+        response = _get_session().post(url, data=orjson.dumps(payload), headers=headers, timeout=TRANZILA_API_TIMEOUT)
+        logger.info("📡 Recurring Payment Response Status: %s", response.status_code)
+
         response.raise_for_status()
-        
-        logger.info("📄 Parsing response JSON...")
-        data = response.json()
-        logger.info(f"✅ Recurring Payment Response: {data}")
-        
+
+        data = orjson.loads(response.content)
+        logger.debug("✅ Recurring Payment Response: %s", data)
+
         if data.get('sto_id'):
-            logger.info(f"✨ Successfully created recurring payment with STO ID: {data.get('sto_id')}")
-        
+            logger.info("✨ Successfully created recurring payment with STO ID: %s", data.get('sto_id'))
+
         return data
     except requests.exceptions.HTTPError as e:
-        logger.error(f"❌ HTTP Error in recurring payment: {e}")
-        logger.error(f"❌ Response content: {response.text if 'response' in locals() else 'No response'}")
+        logger.error("❌ HTTP Error in recurring payment: %s", e)
+        logger.error("❌ Response content: %s", _error_body(response) if 'response' in locals() else 'No response')
         raise Exception(f"Recurring payment failed: {str(e)}")
     except Exception as e:
-        logger.error(f"❌ Unexpected error in recurring payment: {str(e)}")
+        logger.error("❌ Unexpected error in recurring payment: %s", e)
         raise Exception(f"Recurring payment failed: {str(e)}")
 
 
 
+def _new_async_client() -> httpx.AsyncClient:
+    """Build an AsyncClient sized for concurrent Tranzila API calls (HTTP/2 multiplexed when h2 is installed)."""
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(TRANZILA_API_TIMEOUT[1], connect=TRANZILA_API_TIMEOUT[0]),
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    )
+
+
+async def create_recurring_payment_async(
+    token,
+    expire_month,
+    expire_year,
+    full_name,
+    user_email=None,
+    user_id=None,
+    client: Optional[httpx.AsyncClient] = None
+) -> Dict:
+    """
+    Async variant of create_recurring_payment for callers running in an event loop
+
+    Pass a shared httpx.AsyncClient to reuse its connection pool across many
+    standing orders; without one, a short-lived client is created for this call.
+
+    Returns:
+        Same dict as create_recurring_payment
+    """
+    logger.info("🔄 Starting recurring payment creation (async)")
+
+    payload = format_payload_recurring(token, expire_month, expire_year, full_name, user_email, user_id)
+    headers = generate_tranzila_headers(TRANZILA_PUBLIC_API_KEY, TRANZILA_SECRET_API_KEY)
+
+    try:
+        if client is None:
+            async with _new_async_client() as own_client:
+                response = await own_client.post(STO_CREATE_URL, content=orjson.dumps(payload), headers=headers)
+        else:
+            response = await client.post(STO_CREATE_URL, content=orjson.dumps(payload), headers=headers)
+        logger.info("📡 Recurring Payment Response Status: %s", response.status_code)
+
+        response.raise_for_status()
+
+        data = orjson.loads(response.content)
+        if data.get('sto_id'):
+            logger.info("✨ Successfully created recurring payment with STO ID: %s", data.get('sto_id'))
+        return data
+    except httpx.HTTPStatusError as e:
+        logger.error("❌ HTTP Error in recurring payment: %s", e)
+        logger.error("❌ Response content: %s", _error_body(e.response))
+        raise Exception(f"Recurring payment failed: {str(e)}")
+    except Exception as e:
+        logger.error("❌ Unexpected error in recurring payment: %s", e)
+        raise Exception(f"Recurring payment failed: {str(e)}")
+
+
+async def create_recurring_payments_batch_async(payments: List[Dict], max_concurrency: int = 8) -> List[Dict]:
+    """
+    Async version of create_recurring_payments_batch (same arguments and result),
+    for callers already running inside an event loop
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async with _new_async_client() as client:
+        async def _create_one(payment: Dict) -> Dict:
+            async with semaphore:
+                try:
+                    return await create_recurring_payment_async(**payment, client=client)
+                except Exception as e:
+                    return {"success": False, "error": str(e), "user_id": payment.get("user_id")}
+
+        return await asyncio.gather(*(_create_one(payment) for payment in payments))
+
+
+def create_recurring_payments_batch(payments: List[Dict], max_concurrency: int = 8) -> List[Dict]:
+    """
+    Create many standing orders concurrently (e.g. for a bulk subscription run)
+
+    Tranzila has no multi-STO create endpoint, so orders are sent as parallel
+    sto/create requests over one shared connection pool.
+
+    Runs its own event loop, so it is for synchronous callers only; inside a
+    running loop await create_recurring_payments_batch_async instead.
+
+    Args:
+        payments: List of create_recurring_payment keyword-argument dicts
+        max_concurrency: Maximum number of in-flight requests to Tranzila
+
+    Returns:
+        One result per input, in order. Failed orders are returned as
+        {"success": False, "error": ..., "user_id": ...} instead of raising.
+
+    Raises:
+        RuntimeError: If called from inside a running event loop
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        pass
+    else:
+        raise RuntimeError(
+            "create_recurring_payments_batch cannot run inside an event loop; "
+            "await create_recurring_payments_batch_async instead"
+        )
+    if not payments:
+        return []
+    logger.info("🔄 Creating %s recurring payments (max %s concurrent)", len(payments), max_concurrency)
+    return asyncio.run(create_recurring_payments_batch_async(payments, max_concurrency))
+
+
 def format_payload_recurring(token, expire_month, expire_year, full_name, user_email=None, user_id=None):
     """
     יצירת payload ל-STO (Standing Order) לפי תיעוד Tranzila STOV2.
@@ -75,36 +288,41 @@ def format_payload_recurring(token, expire_month, expire_year, full_name, user_e
     Raises:
         ValueError: If expire_year is outside valid range (2020-2030)
     """
-    logger.info("=" * 80)
-    logger.info("🔍 Starting format_payload_recurring based on STOV2 docs")
-    logger.info("=" * 80)
-
-    # Debug: Input parameters
-    logger.info("📥 INPUT PARAMETERS:")
-    logger.info(f"   token (first 15 chars): {token[:15] if token else 'None'}...")
-    logger.info(f"   expire_month: {expire_month} (type: {type(expire_month).__name__})")
-    logger.info(f"   expire_year: {expire_year} (type: {type(expire_year).__name__})")
-    logger.info(f"   full_name: {full_name}")
-    logger.info(f"   user_email: {user_email}")
-    logger.info(f"   user_id: {user_id}")
-    logger.info("-" * 80)
+    # Diagnostic dumps are built only when DEBUG is enabled
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug(_BAR_EQ)
+        logger.debug("🔍 Starting format_payload_recurring based on STOV2 docs")
+        logger.debug(_BAR_EQ)
+        logger.debug("📥 INPUT PARAMETERS:")
+        logger.debug("   token (first 15 chars): %s...", token[:15] if token else 'None')
+        logger.debug("   expire_month: %s (type: %s)", expire_month, type(expire_month).__name__)
+        logger.debug("   expire_year: %s (type: %s)", expire_year, type(expire_year).__name__)
+        logger.debug("   full_name: %s", full_name)
+        logger.debug("   user_email: %s", user_email)
+        logger.debug("   user_id: %s", user_id)
+        logger.debug(_BAR_DASH)
 
     try:
         today = date.today()
-        # חישוב תאריך החיוב הראשון (חודש הבא)
-        next_month_same_day = today + relativedelta(months=1)
-
         # יום החיוב בחודש (מוגבל ל-28 לפי STOV2 lines 38-42)
         charge_day_of_month = min(today.day, 28)
 
-        # Debug: Date calculations
-        logger.info("📅 DATE CALCULATIONS:")
-        logger.info(f"   today: {today.strftime('%Y-%m-%d')} (day of month: {today.day})")
-        logger.info(f"   first_charge_date: {next_month_same_day.strftime('%Y-%m-%d')}")
-        logger.info(f"   charge_dom: {charge_day_of_month} (capped at 28)")
-        logger.info("-" * 80)
+        # חישוב תאריך החיוב הראשון (חודש הבא, באותו יום חיוב)
+        # Day <= 28 exists in every month, so a plain month/year rollover is enough
+        if today.month == 12:
+            next_month_same_day = date(today.year + 1, 1, charge_day_of_month)
+        else:
+            next_month_same_day = date(today.year, today.month + 1, charge_day_of_month)
+
+        if debug:
+            logger.debug("📅 DATE CALCULATIONS:")
+            logger.debug("   today: %s (day of month: %s)", today, today.day)
+            logger.debug("   first_charge_date: %s", next_month_same_day)
+            logger.debug("   charge_dom: %s (capped at 28)", charge_day_of_month)
+            logger.debug(_BAR_DASH)
     except Exception as e:
-        logger.error(f"❌ Error in date calculation: {str(e)}")
+        logger.error("❌ Error in date calculation: %s", e)
         raise
 
     # 1. בניית אובייקט ה-Client [STOV2: lines 75-108]
@@ -117,123 +335,94 @@ def format_payload_recurring(token, expire_month, expire_year, full_name, user_e
         # phone_number, address - אופציונליים, לא שולחים אם ריקים
     }
 
-    # Debug: Client object
-    logger.info("👤 CLIENT OBJECT:")
-    logger.info(f"   name: {client_obj.get('name')}")
-    logger.info(f"   email: {client_obj.get('email')}")
-    logger.info(f"   (no id/phone/address - not provided)")
-    logger.info("-" * 80)
-    
+    if debug:
+        logger.debug("👤 CLIENT OBJECT:")
+        logger.debug("   name: %s", client_obj.get('name'))
+        logger.debug("   email: %s", client_obj.get('email'))
+        logger.debug("   (no id/phone/address - not provided)")
+        logger.debug(_BAR_DASH)
+
     # 2. בניית אובייקט ה-Card [STOV2: lines 185-219]
     # המרת שנה ל-4 ספרות ו-validation
-    logger.info("💳 CARD PROCESSING:")
-    logger.info(f"   expire_year (raw input): {expire_year}")
-
-    year = int(expire_year)
-    logger.info(f"   expire_year (after int()): {year}")
-
-    if year < 100:
-        year = year + 2000
-        logger.info(f"   expire_year (after +2000): {year}")
-
-    # בדיקה שהשנה בטווח סביר (2020-2099)
-    # הערה: STOV2 line 201-202 מציין 2030 כדוגמה, לא כהגבלה קשיחה
-    # מאפשרים עד 2099 כדי לא לחסום כרטיסים תקפים
-    if year < 2020 or year > 2099:
-        logger.error(f"❌ Invalid expire_year: {year}. Must be between 2020-2099")
-        raise ValueError(f"Expiry year must be between 2020-2099, got {year}")
-
-    logger.info(f"   ✅ expire_year validation passed: {year}")
+    month, year = _normalize_expiry(expire_month, expire_year)
+    if debug:
+        logger.debug("💳 CARD PROCESSING:")
+        logger.debug("   expire_year: %s (raw input) -> %s", expire_year, year)
 
     card_obj = {
         "token": token,
-        "expire_month": int(expire_month),
+        "expire_month": month,
         "expire_year": year,
     }
 
-    # Debug: Card object
-    logger.info("💳 CARD OBJECT:")
-    logger.info(f"   token (first 15 chars): {token[:15]}...")
-    logger.info(f"   expire_month: {card_obj['expire_month']}")
-    logger.info(f"   expire_year: {card_obj['expire_year']}")
-    logger.info("-" * 80)
+    if debug:
+        logger.debug("💳 CARD OBJECT:")
+        logger.debug("   token (first 15 chars): %s...", token[:15])
+        logger.debug("   expire_month: %s", card_obj['expire_month'])
+        logger.debug("   expire_year: %s", card_obj['expire_year'])
+        logger.debug(_BAR_DASH)
 
     # 3. בניית ה-Payload הראשי [STOV2: lines 1-62]
     payload = {
-        "terminal_name": TRANZILA_SUPPLIER,  # Required [STOV2: line 11-12]
-        "sto_payments_number": 99,  # Required, max 9999 [STOV2: lines 13-17]
-        "first_charge_date": next_month_same_day.strftime("%Y-%m-%d"),  # Optional [STOV2: lines 27-28]
-        "charge_frequency": "monthly",  # Required, enum value [STOV2: lines 18-26]
+        **_BASE_STO_PAYLOAD,
+        "first_charge_date": next_month_same_day.isoformat(),  # Optional [STOV2: lines 27-28]
         "charge_dom": charge_day_of_month,  # Required, 1-28 [STOV2: lines 38-42]
-        "currency_code": "USD",  # Optional, default USD [STOV2: lines 29-37]
 
         # אובייקט Client (אופציונלי) [STOV2: lines 50-51, 75-108]
         "client": client_obj,
 
         # אובייקט Item (חובה!) - לפי השגיאה של טרנזילה צריך להיות 'items' ברבים!
         # התיעוד STOV2 אומר 'item' ביחיד, אבל ה-API דורש 'items' ברשימה
-        "items": [{
-            "name": "Monthly TalkAPI Subscription",  # Required [STOV2: line 160]
-            "unit_price": 19.00,  # Required, min 0.01 max 99999 [STOV2: lines 135-140]
-            "units_number": 1,  # Optional, default 1 [STOV2: lines 141-146]
-            "price_currency": "USD",  # Optional, enum ILS/USD/EUR [STOV2: lines 147-150, 162-171]
-            "price_type": "G",  # Optional, G=Gross/N=Net [STOV2: lines 151-152, 172-184]
-            "vat_percent": 0  # Optional, no VAT for USD [STOV2: lines 153-158]
-        }],
+        "items": [dict(_STO_ITEM)],
 
         # אובייקט Card (חובה אם לא msv) [STOV2: lines 54-55, 185-219]
         "card": card_obj,
 
-        # שפת תגובה (אופציונלי) [STOV2: lines 58-59, 242-251]
-        "response_language": "english",
-
         # שם המשתמש שיצר (אופציונלי) [STOV2: lines 60-62]
         "created_by_user": full_name,
     }
 
-    # Debug: Final payload overview
-    logger.info("📦 FINAL PAYLOAD FOR STO CREATION:")
-    logger.info(f"   terminal_name: {payload['terminal_name']}")
-    logger.info(f"   sto_payments_number: {payload['sto_payments_number']}")
-    logger.info(f"   first_charge_date: {payload['first_charge_date']}")
-    logger.info(f"   charge_frequency: {payload['charge_frequency']}")
-    logger.info(f"   charge_dom: {payload['charge_dom']}")
-    logger.info(f"   currency_code: {payload['currency_code']}")
-    logger.info(f"   client: {payload['client']}")
-    logger.info(f"   items: {payload['items']}")  # Changed from 'item' to 'items'
-    logger.info(f"   card.token (first 15 chars): {payload['card']['token'][:15]}...")
-    logger.info(f"   card.expire_month: {payload['card']['expire_month']}")
-    logger.info(f"   card.expire_year: {payload['card']['expire_year']}")
-    logger.info(f"   response_language: {payload['response_language']}")
-    logger.info(f"   created_by_user: {payload['created_by_user']}")
-    logger.info("=" * 80)
-    logger.info("🚀 Payload ready to send to Tranzila STOV2 API")
-    logger.info("⚠️  NOTE: Using 'items' (plural) instead of 'item' per Tranzila API error")
-    logger.info("=" * 80)
+    if debug:
+        logger.debug("📦 FINAL PAYLOAD FOR STO CREATION:")
+        logger.debug("   terminal_name: %s", payload['terminal_name'])
+        logger.debug("   sto_payments_number: %s", payload['sto_payments_number'])
+        logger.debug("   first_charge_date: %s", payload['first_charge_date'])
+        logger.debug("   charge_frequency: %s", payload['charge_frequency'])
+        logger.debug("   charge_dom: %s", payload['charge_dom'])
+        logger.debug("   currency_code: %s", payload['currency_code'])
+        logger.debug("   client: %s", payload['client'])
+        logger.debug("   items: %s", payload['items'])  # Changed from 'item' to 'items'
+        logger.debug("   card.token (first 15 chars): %s...", payload['card']['token'][:15])
+        logger.debug("   card.expire_month: %s", payload['card']['expire_month'])
+        logger.debug("   card.expire_year: %s", payload['card']['expire_year'])
+        logger.debug("   response_language: %s", payload['response_language'])
+        logger.debug("   created_by_user: %s", payload['created_by_user'])
+        logger.debug(_BAR_EQ)
+        logger.debug("⚠️  NOTE: Using 'items' (plural) instead of 'item' per Tranzila API error")
+    logger.info("🚀 STO payload ready (charge_dom=%s, first_charge_date=%s)",
+                payload['charge_dom'], payload['first_charge_date'])
 
     return payload
     
     
 def format_payload_initial(params):
     # Clean and validate card number
-    card_number = params["card_number"].replace(" ", "").replace("-", "")
-
-    # Ensure it's digits only and proper length (13-19 digits for most cards)
-    if not card_number.isdigit():
-        raise ValueError("Card number must contain only digits")
+    card_number = params["card_number"].translate(_CARD_NUMBER_STRIP)
 
-    if len(card_number) < 13 or len(card_number) > 19:
+    # Ensure it's digits only and proper length (13-19 digits for most cards).
+    # One regex pass on the valid path; work out which rule failed only on error
+    if not _CARD_NUMBER_RE.fullmatch(card_number):
+        if not (card_number.isascii() and card_number.isdigit()):
+            raise ValueError("Card number must contain only digits")
         raise ValueError("Card number must be between 13-19 digits")
 
     # Validate CVV if provided
     cvv = params.get("cvv", "").strip()
-    if cvv and (not cvv.isdigit() or len(cvv) < 3 or len(cvv) > 4):
+    if cvv and not _CVV_RE.fullmatch(cvv):
         raise ValueError("CVV must be 3 or 4 digits")
 
     # Convert expire_year to 4-digit format if needed
-    expire_year = int(params["expire_year"])
-    if expire_year < 100:
-        expire_year = expire_year + 2000
+    expire_month, expire_year = _normalize_expiry(params["expire_month"], params["expire_year"])
 
     # Build base payload without any null values
     payload = {
@@ -241,7 +430,7 @@ def format_payload_initial(params):
         "txn_currency_code": "USD",
         "txn_type": "debit",
         "card_number": card_number,
-        "expire_month": int(params["expire_month"]),
+        "expire_month": expire_month,
         "expire_year": expire_year,
         "payment_plan": 1,
     }
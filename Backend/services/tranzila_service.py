@@ -1,31 +1,49 @@
 import time
 import hmac
-import hashlib
 import secrets
-import binascii
+from functools import lru_cache
+
+# httpx only speaks HTTP/2 when the optional h2 package is installed; the async
+# Tranzila clients enable it when available and otherwise stay on HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@lru_cache(maxsize=8)
+def _encoded_credentials(app_key: str, secret: str) -> tuple:
+    """UTF-8 bytes of the (app_key, secret) pair - keys are fixed per process, so encode once"""
+    return app_key.encode('utf-8'), secret.encode('utf-8')
+
 
 def generate_tranzila_headers(app_key: str, secret: str) -> dict:
     """
     Generate Tranzila API headers for authentication
     Based on official Tranzila documentation
     """
+    app_key_bytes, secret_bytes = _encoded_credentials(app_key, secret)
+
     # Generate timestamp (Unix timestamp)
-    timestamp = int(time.time())
-    
+    timestamp = str(int(time.time()))
+
     # Generate nonce (40 bytes = 80 hex chars)
-    nonce = str(binascii.hexlify(secrets.token_bytes(40)), 'utf-8')
-    
+    nonce = secrets.token_hex(40)
+
     # Create access key using HMAC-SHA256
     # key = (private_key + timestamp + nonce)
     # message = public_key (app_key)
-    key = (secret + str(timestamp) + nonce).encode('utf-8')
-    msg = app_key.encode('utf-8')
-    access_key = hmac.new(key, msg, hashlib.sha256).hexdigest()
+    key = secret_bytes + timestamp.encode('ascii') + nonce.encode('ascii')
+    # One-shot hmac.digest() skips building an HMAC object
+    access_key = hmac.digest(key, app_key_bytes, "sha256").hex()
 
     return {
         "X-tranzila-api-app-key": app_key,
-        "X-tranzila-api-request-time": str(timestamp),
+        "X-tranzila-api-request-time": timestamp,
         "X-tranzila-api-nonce": nonce,
         "X-tranzila-api-access-token": access_key,
         "Content-Type": "application/json",
-    }
\ No newline at end of file
+        # Explicit so callers passing these headers on their own still get compressed replies
+        "Accept-Encoding": "gzip",
+    }
@@ -4,14 +4,33 @@ Handles database operations, authentication, and user management
 """
 
 import os
-from supabase import create_client, Client
-from dotenv import load_dotenv
+import asyncio
+import atexit
+import base64
+import hashlib
+import queue
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+import jwt
+from supabase import create_client, acreate_client, Client
+from utils.env import load_env
 from typing import Optional, Dict, List, Any
-from datetime import datetime, date
-import json
+from datetime import datetime, date, timezone
+import logging
+from utils.ttl_cache import TTLCache
 
 # Load environment variables
-load_dotenv()
+load_env()
+
+# Handlers, format and propagation come from the app's logging setup (records are
+# queued off the request thread there, see utils/log_queue.py). SUPABASE_LOG_LEVEL
+# (e.g. DEBUG) overrides the level for this module only.
+logger = logging.getLogger(__name__)
+SUPABASE_LOG_LEVEL = os.getenv('SUPABASE_LOG_LEVEL')
+if SUPABASE_LOG_LEVEL:
+    logger.setLevel(SUPABASE_LOG_LEVEL.upper())
 
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -25,38 +44,260 @@ if not SUPABASE_URL or not SUPABASE_ANON_KEY:
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 supabase_admin: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY) if SUPABASE_SERVICE_KEY else None
 
+# Shared HTTP session for direct Supabase Auth calls (verify_token fallback),
+# so repeated verifications reuse a keep-alive connection instead of a new TLS handshake
+AUTH_USER_URL = f"{SUPABASE_URL}/auth/v1/user"
+AUTH_REQUEST_TIMEOUT = 5  # seconds
+# Keep-alive connections per worker process; small so all workers together stay
+# well under Supabase's connection limits
+SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', '5'))
+_auth_session = requests.Session()
+_auth_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=SUPABASE_POOL_SIZE))
+_auth_session.headers.update({'apikey': SUPABASE_ANON_KEY, 'Content-Type': 'application/json'})
+
+# Per-process cache of user_profiles rows (user_id -> row). The update/cancel methods
+# below drop the row, but only in their own process: other gunicorn workers keep
+# serving it until the TTL expires. Anything that reads a value in order to write it
+# back (quota counters) or acts on subscription state must pass fresh=True.
+PROFILE_CACHE_MAX_ENTRIES = 10_000
+PROFILE_CACHE_TTL_SECONDS = 30
+
+# api_history row counts ((user_id, favorites_only) -> int), so a paginated listing
+# does not run count(*) over the user's whole history on every page. Dropped on
+# save/delete/toggle_favorite for that user.
+HISTORY_COUNT_CACHE_MAX_ENTRIES = 10_000
+HISTORY_COUNT_CACHE_TTL_SECONDS = 60
+
+# Cap on in-flight writes through the async client (per event loop)
+ASYNC_WRITE_MAX_CONCURRENCY = 20
+
+# Columns returned by history listings; the potentially large generated_code and
+# execution_result bodies are only fetched by get_api_history_detail
+HISTORY_LIST_COLUMNS = 'id,user_id,user_query,endpoint,status,is_favorite,created_at'
+
+# track_api_usage is fire-and-forget: events are queued and a background thread
+# flushes them, aggregated per (user_id, endpoint, day), every USAGE_FLUSH_INTERVAL
+# seconds or USAGE_BATCH_MAX_EVENTS events, through one track_api_usage_batch RPC
+USAGE_QUEUE_MAX_SIZE = 10_000
+USAGE_BATCH_MAX_EVENTS = 500
+USAGE_FLUSH_INTERVAL = 0.25  # seconds
+USAGE_STOP_TIMEOUT = 5.0  # seconds to wait for the final flush at exit
+_USAGE_STOP = object()  # queue sentinel: write the current batch and exit
+
+# Decoded JWT claims keyed by a hash of the token; entries are also dropped once
+# the token's own exp has passed
+JWT_CACHE_MAX_ENTRIES = 50_000
+JWT_CACHE_TTL_SECONDS = 300
+
 class SupabaseManager:
     """Manager class for Supabase operations"""
     
     def __init__(self):
         self.client = supabase
         self.admin_client = supabase_admin
+        # Profile reads go through the admin client (bypasses RLS) when a service key is configured
+        self._read_client = self.admin_client or self.client
+        self._profile_cache = TTLCache(PROFILE_CACHE_MAX_ENTRIES, PROFILE_CACHE_TTL_SECONDS)
+        self._count_cache = TTLCache(HISTORY_COUNT_CACHE_MAX_ENTRIES, HISTORY_COUNT_CACHE_TTL_SECONDS)
+        self._jwt_cache = TTLCache(JWT_CACHE_MAX_ENTRIES, JWT_CACHE_TTL_SECONDS)
+        # Async client + write throttle per event loop (they can't be shared across loops)
+        self._async_clients: Dict[asyncio.AbstractEventLoop, tuple] = {}
+        self._async_lock = threading.Lock()
+        # Background usage tracking, worker started on first use
+        self._usage_queue: "queue.Queue[tuple]" = queue.Queue(maxsize=USAGE_QUEUE_MAX_SIZE)
+        self._usage_thread: Optional[threading.Thread] = None
+        self._usage_lock = threading.Lock()
+
+    async def _get_async_client(self) -> tuple:
+        """
+        (AsyncClient, Semaphore) for the running loop (service key when available, like admin_client).
+
+        Their HTTP connections and waiters belong to the loop that created them, so each
+        loop (e.g. each asyncio.run()) gets its own pair. Callers that run a short-lived
+        loop should await aclose_async_client() before it ends.
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._async_clients.get(loop)
+        if entry is not None:
+            return entry
+        client = await acreate_client(SUPABASE_URL, SUPABASE_SERVICE_KEY or SUPABASE_ANON_KEY)
+        with self._async_lock:
+            # A closed loop's connections died with it; nothing left to await there
+            for stale in [l for l in self._async_clients if l.is_closed()]:
+                del self._async_clients[stale]
+            entry = self._async_clients.setdefault(loop, (client, asyncio.Semaphore(ASYNC_WRITE_MAX_CONCURRENCY)))
+        if entry[0] is not client:
+            # Another coroutine on this loop created one first
+            await self._aclose_client(client)
+        return entry
+
+    async def aclose_async_client(self) -> None:
+        """Close the running loop's AsyncClient, if one was created"""
+        with self._async_lock:
+            entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await self._aclose_client(entry[0])
+
+    @staticmethod
+    async def _aclose_client(client) -> None:
+        # Writes only go through PostgREST, so that is the only pool holding connections
+        try:
+            await client.postgrest.aclose()
+        except Exception:
+            logger.debug("Closing async Supabase client failed", exc_info=True)
     
     def track_api_usage(self, user_id: str, endpoint: str) -> bool:
-        """Track API usage for a user"""
+        """Queue an API usage event for a user (written in the background, see _usage_worker)"""
+        self._ensure_usage_worker()
         try:
-            # Call the database function to track usage
-            self.client.rpc('track_api_usage', {
-                'p_user_id': user_id,
-                'p_endpoint': endpoint
-            }).execute()
+            self._usage_queue.put_nowait((user_id, endpoint, date.today().isoformat()))
             return True
-        except Exception as e:
-            print(f"Error tracking API usage: {e}")
+        except queue.Full:
+            logger.warning("⚠️ Usage queue is full, API usage event dropped")
             return False
-    
-    def get_user_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
-        """Get user profile information"""
+
+    def _ensure_usage_worker(self) -> None:
+        if self._usage_thread is not None:
+            return
+        with self._usage_lock:
+            if self._usage_thread is None:
+                self._usage_thread = threading.Thread(target=self._usage_worker, name="supabase-usage", daemon=True)
+                self._usage_thread.start()
+                atexit.register(self.stop_usage_worker)
+
+    def _usage_worker(self) -> None:
+        """Collect queued usage events for up to USAGE_FLUSH_INTERVAL and write them as one batch"""
+        stopping = False
+        while not stopping:
+            event = self._usage_queue.get()
+            if event is _USAGE_STOP:
+                return
+            batch = [event]
+            deadline = time.monotonic() + USAGE_FLUSH_INTERVAL
+            while len(batch) < USAGE_BATCH_MAX_EVENTS:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = self._usage_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if event is _USAGE_STOP:
+                    stopping = True
+                    break
+                batch.append(event)
+            self._write_usage_batch(batch)
+
+    def stop_usage_worker(self, timeout: float = USAGE_STOP_TIMEOUT) -> None:
+        """Stop the usage worker once it has written its in-flight batch (run at exit)"""
+        with self._usage_lock:
+            thread, self._usage_thread = self._usage_thread, None
+        if thread is None:
+            return
+        try:
+            self._usage_queue.put(_USAGE_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️ Usage queue is full, could not stop the usage worker")
+            return
+        thread.join(timeout)
+        if thread.is_alive():
+            logger.warning("⚠️ Usage worker did not finish within %ss", timeout)
+            return
+        # Events queued behind the sentinel
+        self.flush_api_usage()
+
+    def flush_api_usage(self) -> None:
+        """Synchronously write whatever usage events are still queued"""
+        batch = []
+        while True:
+            try:
+                event = self._usage_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _USAGE_STOP:
+                batch.append(event)
+        if batch:
+            self._write_usage_batch(batch)
+
+    def _write_usage_batch(self, batch: List[tuple]) -> None:
+        counts: Dict[tuple, int] = {}
+        for event in batch:
+            counts[event] = counts.get(event, 0) + 1
+        events = [
+            {'user_id': user_id, 'endpoint': endpoint, 'usage_date': usage_date, 'count': count}
+            for (user_id, endpoint, usage_date), count in counts.items()
+        ]
         try:
-            # Use admin client for consistent access
+            # Aggregates into api_usage server-side (see track_api_usage_batch in supabase_init.py).
+            # The function runs as the caller, so the anon key would be rejected by RLS
             client = self.admin_client or self.client
-            response = client.schema('api').table('user_profiles').select('*').eq('user_id', user_id).execute()
-            if response.data:
-                return response.data[0]
+            client.rpc('track_api_usage_batch', {'p_events': events}).execute()
+        except Exception:
+            logger.exception("❌ Error tracking API usage (%s events dropped)", len(batch))
+
+    async def track_api_usage_async(self, user_id: str, endpoint: str) -> bool:
+        """Async variant of track_api_usage"""
+        try:
+            client, semaphore = await self._get_async_client()
+            async with semaphore:
+                await client.rpc('track_api_usage', {
+                    'p_user_id': user_id,
+                    'p_endpoint': endpoint
+                }).execute()
+            return True
+        except Exception:
+            logger.exception("❌ Error tracking API usage")
+            return False
+    
+    def get_user_profile(self, user_id: str, fresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get user profile information
+
+        fresh=True skips the (up to PROFILE_CACHE_TTL_SECONDS stale) cached row and reads
+        the database; the result still refreshes the cache.
+        """
+        cached = None if fresh else self._profile_cache.get(user_id)
+        if cached is not None:
+            # Callers mutate the returned dict, so hand out a copy
+            return dict(cached)
+        try:
+            # maybe_single: PostgREST returns the row object rather than a one-element list.
+            # postgrest-py gives back None instead of a response when there is no row
+            response = self._read_client.schema('api').table('user_profiles').select('*').eq('user_id', user_id).maybe_single().execute()
+            if response is not None and response.data:
+                profile = response.data
+                self._profile_cache.set(user_id, profile)
+                return dict(profile)
             return None
-        except Exception as e:
-            print(f"Error getting user profile: {e}")
+        except Exception:
+            logger.exception("❌ Error getting user profile")
             return None
+
+    def get_user_profiles_bulk(self, user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Get several user profiles in one query (user_id -> profile).
+
+        Cached profiles are served from the profile cache; the rest are fetched with a
+        single user_id IN (...) filter and cached. Users without a profile are omitted.
+        """
+        profiles: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            cached = self._profile_cache.get(user_id)
+            if cached is not None:
+                profiles[user_id] = dict(cached)
+            else:
+                missing.append(user_id)
+        if not missing:
+            return profiles
+        try:
+            response = self._read_client.schema('api').table('user_profiles').select('*').in_('user_id', missing).execute()
+            for profile in response.data:
+                self._profile_cache.set(profile['user_id'], profile)
+                profiles[profile['user_id']] = dict(profile)
+        except Exception:
+            logger.exception("❌ Error getting user profiles")
+        return profiles
     
     def create_user_profile(self, user_id: str, email: str, username: str = None, full_name: str = None) -> bool:
         """Create a new user profile"""
@@ -72,12 +313,14 @@ class SupabaseManager:
                 'last_api_call_date': date.today().isoformat()
             }
             
-            # Always use admin client for write operations to bypass RLS
+            # Always use admin client for write operations to bypass RLS.
+            # INSERT ... ON CONFLICT (user_id) DO NOTHING: an existing profile is left as-is,
+            # so callers don't need a get_user_profile round trip first
             client = self.admin_client or self.client
-            client.schema('api').table('user_profiles').insert(profile_data).execute()
+            client.schema('api').table('user_profiles').upsert(profile_data, on_conflict='user_id', ignore_duplicates=True).execute()
             return True
-        except Exception as e:
-            print(f"Error creating user profile: {e}")
+        except Exception:
+            logger.exception("❌ Error creating user profile")
             return False
     
     def update_user_profile(self, user_id: str, updates: Dict[str, Any]) -> bool:
@@ -86,9 +329,10 @@ class SupabaseManager:
             # Always use admin client for write operations to bypass RLS
             client = self.admin_client or self.client
             client.schema('api').table('user_profiles').update(updates).eq('user_id', user_id).execute()
+            self._profile_cache.pop(user_id)
             return True
-        except Exception as e:
-            print(f"Error updating user profile: {e}")
+        except Exception:
+            logger.exception("❌ Error updating user profile")
             return False
     
     def save_api_history(self, user_id: str, user_query: str, generated_code: str = None, 
@@ -96,103 +340,232 @@ class SupabaseManager:
                         execution_result: Dict[str, Any] = None) -> bool:
         """Save API call to history"""
         try:
-            history_data = {
-                'user_id': user_id,
-                'user_query': user_query,
-                'generated_code': generated_code,
-                'endpoint': endpoint,
-                'status': status,
-                'execution_result': json.dumps(execution_result) if execution_result else None,
-                'is_favorite': False
-            }
+            history_data = self._history_row(user_id, user_query, generated_code, endpoint, status, execution_result)
 
             # Use admin client for write operations to bypass RLS
             client = self.admin_client or self.client
             client.schema('api').table('api_history').insert(history_data).execute()
+            self._invalidate_history_count(user_id)
             return True
-        except Exception as e:
-            print(f"Error saving API history: {e}")
+        except Exception:
+            logger.exception("❌ Error saving API history")
             return False
+
+    async def save_api_history_async(self, user_id: str, user_query: str, generated_code: str = None,
+                                     endpoint: str = None, status: str = 'Success',
+                                     execution_result: Dict[str, Any] = None) -> bool:
+        """Async variant of save_api_history"""
+        try:
+            history_data = self._history_row(user_id, user_query, generated_code, endpoint, status, execution_result)
+            client, semaphore = await self._get_async_client()
+            async with semaphore:
+                await client.schema('api').table('api_history').insert(history_data).execute()
+            self._invalidate_history_count(user_id)
+            return True
+        except Exception:
+            logger.exception("❌ Error saving API history")
+            return False
+
+    async def record_api_call_async(self, user_id: str, endpoint: str, user_query: str,
+                                    generated_code: str = None, status: str = 'Success',
+                                    execution_result: Dict[str, Any] = None) -> tuple:
+        """
+        Track usage and save history for one API call concurrently.
+
+        The two writes are independent, so they overlap instead of costing two
+        sequential round trips. Returns (tracked, saved).
+        """
+        return tuple(await asyncio.gather(
+            self.track_api_usage_async(user_id, endpoint),
+            self.save_api_history_async(user_id, user_query, generated_code, endpoint, status, execution_result)
+        ))
+
+    @staticmethod
+    def _history_row(user_id: str, user_query: str, generated_code: Optional[str], endpoint: Optional[str],
+                     status: str, execution_result: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """api_history insert payload shared by the sync and async savers"""
+        return {
+            'user_id': user_id,
+            'user_query': user_query,
+            'generated_code': generated_code,
+            'endpoint': endpoint,
+            'status': status,
+            # execution_result is a JSONB column: send the dict as-is so it's encoded once with the request body
+            'execution_result': execution_result or None,
+            'is_favorite': False
+        }
     
-    def get_api_history(self, user_id: str, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """Get user's API call history"""
+    @staticmethod
+    def _encode_history_cursor(row: Dict[str, Any]) -> str:
+        """Opaque cursor pointing just past row in (created_at, id) order"""
+        return base64.urlsafe_b64encode(f"{row['created_at']}|{row['id']}".encode()).decode()
+
+    @staticmethod
+    def _decode_history_cursor(cursor: str) -> tuple:
+        """(created_at, id) from a cursor made by _encode_history_cursor"""
+        created_at, _, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().partition('|')
+        if not created_at or not row_id:
+            raise ValueError("Malformed history cursor")
+        return created_at, row_id
+
+    def list_api_history(self, user_id: str, limit: int = 50, cursor: str = None) -> Dict[str, Any]:
+        """
+        Get one page of user's API call history, newest first
+
+        Keyset pagination on (created_at, id) instead of OFFSET, so later pages cost
+        the same as the first. Pass the returned next_cursor to get the following page;
+        it is None once there are no more rows.
+        """
         try:
-            response = self.client.table('api_history').select('*').eq('user_id', user_id).order('created_at', desc=True).range(offset, offset + limit - 1).execute()
-            return response.data
-        except Exception as e:
-            print(f"Error getting API history: {e}")
-            return []
+            query = self.client.table('api_history').select(HISTORY_LIST_COLUMNS).eq('user_id', user_id)
+            if cursor:
+                created_at, row_id = self._decode_history_cursor(cursor)
+                query = query.or_(
+                    f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})'
+                )
+            response = query.order('created_at', desc=True).order('id', desc=True).limit(limit).execute()
+            rows = response.data
+            next_cursor = self._encode_history_cursor(rows[-1]) if len(rows) == limit else None
+            return {'data': rows, 'next_cursor': next_cursor}
+        except Exception:
+            logger.exception("❌ Error getting API history")
+            return {'data': [], 'next_cursor': None}
+    
+    def get_api_history_detail(self, history_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get one full history entry, including generated_code and execution_result"""
+        try:
+            response = self.client.table('api_history').select('*').eq('id', history_id).eq('user_id', user_id).execute()
+            if response.data:
+                return response.data[0]
+            return None
+        except Exception:
+            logger.exception("❌ Error getting API history entry")
+            return None
+
+    def get_api_history_count(self, user_id: str, favorites_only: bool = False) -> int:
+        """Total number of history rows for a user (cached, see HISTORY_COUNT_CACHE_TTL_SECONDS)"""
+        key = (user_id, favorites_only)
+        cached = self._count_cache.get(key)
+        if cached is not None:
+            return cached
+        try:
+            # head=True: only the Content-Range count comes back, no row data
+            query = self.client.table('api_history').select('id', count='exact', head=True).eq('user_id', user_id)
+            if favorites_only:
+                query = query.eq('is_favorite', True)
+            count = query.execute().count or 0
+            self._count_cache.set(key, count)
+            return count
+        except Exception:
+            logger.exception("❌ Error counting API history")
+            return 0
+
+    def _invalidate_history_count(self, user_id: str) -> None:
+        """Drop cached history counts after a write for user_id"""
+        self._count_cache.pop((user_id, False))
+        self._count_cache.pop((user_id, True))
     
     def toggle_favorite(self, history_id: str, user_id: str) -> bool:
         """Toggle favorite status of an API call"""
         try:
-            # Get current favorite status
-            response = self.client.table('api_history').select('is_favorite').eq('id', history_id).eq('user_id', user_id).execute()
+            # Flips is_favorite in a single UPDATE ... RETURNING (see toggle_history_favorite
+            # in supabase_init.py); NULL means no matching row
+            response = self.client.rpc('toggle_history_favorite', {
+                'p_id': history_id,
+                'p_user_id': user_id
+            }).execute()
             
-            if not response.data:
+            if response.data is None:
                 return False
             
-            current_status = response.data[0]['is_favorite']
-            new_status = not current_status
-            
-            # Update favorite status
-            self.client.table('api_history').update({'is_favorite': new_status}).eq('id', history_id).eq('user_id', user_id).execute()
+            self._invalidate_history_count(user_id)
             return True
-        except Exception as e:
-            print(f"Error toggling favorite: {e}")
+        except Exception:
+            logger.exception("❌ Error toggling favorite")
             return False
     
+    def get_api_history_bulk(self, user_ids: List[str], limit: int = 50) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get recent API call history for several users in one query (user_id -> rows, newest first).
+
+        limit caps the rows fetched in total, not per user.
+        """
+        history: Dict[str, List[Dict[str, Any]]] = {user_id: [] for user_id in user_ids}
+        if not history:
+            return history
+        try:
+            response = self.client.table('api_history').select(HISTORY_LIST_COLUMNS).in_('user_id', list(history)).order('created_at', desc=True).order('id', desc=True).limit(limit).execute()
+            for row in response.data:
+                history[row['user_id']].append(row)
+        except Exception:
+            logger.exception("❌ Error getting API history")
+        return history
+    
     def get_favorites(self, user_id: str) -> List[Dict[str, Any]]:
         """Get user's favorite API calls"""
         try:
-            response = self.client.table('api_history').select('*').eq('user_id', user_id).eq('is_favorite', True).order('created_at', desc=True).execute()
+            response = self.client.table('api_history').select(HISTORY_LIST_COLUMNS).eq('user_id', user_id).eq('is_favorite', True).order('created_at', desc=True).execute()
             return response.data
-        except Exception as e:
-            print(f"Error getting favorites: {e}")
+        except Exception:
+            logger.exception("❌ Error getting favorites")
             return []
     
     def delete_api_history(self, history_id: str, user_id: str) -> bool:
         """Delete an API call from history"""
         try:
             self.client.table('api_history').delete().eq('id', history_id).eq('user_id', user_id).execute()
+            self._invalidate_history_count(user_id)
             return True
-        except Exception as e:
-            print(f"Error deleting API history: {e}")
+        except Exception:
+            logger.exception("❌ Error deleting API history")
+            return False
+
+    def delete_api_history_bulk(self, user_id: str, history_ids: List[str]) -> bool:
+        """Delete several of a user's API calls from history in one statement"""
+        if not history_ids:
+            return True
+        try:
+            self.client.table('api_history').delete().in_('id', history_ids).eq('user_id', user_id).execute()
+            self._invalidate_history_count(user_id)
+            return True
+        except Exception:
+            logger.exception("❌ Error deleting API history")
+            return False
+
+    def delete_all_api_history(self, user_id: str) -> bool:
+        """Delete a user's entire API call history"""
+        try:
+            self.client.table('api_history').delete().eq('user_id', user_id).execute()
+            self._invalidate_history_count(user_id)
+            return True
+        except Exception:
+            logger.exception("❌ Error deleting API history")
             return False
     
     # Subscription Management Functions
     def update_subscription_after_payment(self, user_id: str, sto_id: str, plan_type: str = 'pro', user_email: str = None, user_token: str = None, limits: dict = None) -> bool:
         """Update user subscription after successful payment"""
         try:
-            from datetime import datetime, timezone
-
             # Use provided limits or default
             if limits is None:
                 limits = {"convert_limit": 500, "run_limit": 2000} if plan_type == 'pro' else {"total_limit": 50}
 
-            update_data = {
-                'plan_type': plan_type,
-                'sto_id': sto_id,
-                'subscription_status': 'active',
-                'subscription_start_date': datetime.now(timezone.utc).isoformat(),
-                'last_payment_date': datetime.now(timezone.utc).isoformat(),
-                'payment_method': 'credit_card',
-                'daily_limit': 100 if plan_type == 'pro' else 50  # Pro gets 100/day
-            }
+            # Subscription start and payment date are the same instant
+            now_iso = datetime.now(timezone.utc).isoformat()
 
             # Always use admin client for subscription updates to bypass RLS
             # User token is not needed since admin client has full access
-            print(f"Using admin client to update subscription for {user_email}")
+            logger.debug("Using admin client to update subscription for %s", user_email)
             client = self.admin_client or self.client
 
             # Update with correct column names
             profile_data = {
                 "plan_type": plan_type,
                 "subscription_status": "active",
-                "subscription_start_date": update_data['subscription_start_date'],
-                "last_payment_date": update_data['last_payment_date'],
+                "subscription_start_date": now_iso,
+                "last_payment_date": now_iso,
                 "payment_method": "credit_card",
-                "daily_limit": update_data['daily_limit']
+                "daily_limit": 100 if plan_type == 'pro' else 50  # Pro gets 100/day
             }
 
             # Only include sto_id if it's not None (for Hosted Fields payments, sto_id is None)
@@ -201,37 +574,32 @@ class SupabaseManager:
 
             # Update based on user_id (unique) - use api schema
             response = client.schema('api').table('user_profiles').update(profile_data).eq('user_id', user_id).execute()
+            self._profile_cache.pop(user_id)
 
             # If we reached here without exception, the update succeeded
-            print(f"✅ Updated subscription for user {user_id}: plan={plan_type}, sto_id={sto_id}, limits={limits}")
+            logger.info("✅ Updated subscription for user %s: plan=%s, sto_id=%s, limits=%s", user_id, plan_type, sto_id, limits)
             return True
 
-        except Exception as e:
-            print(f"❌ Error updating subscription: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("❌ Error updating subscription")
             return False
     
     def get_user_sto_id(self, user_id: str) -> Optional[str]:
         """Get user's STO ID for cancellation"""
         try:
-            # Use admin client for consistent access
-            client = self.admin_client or self.client
-            response = client.schema('api').table('user_profiles').select('sto_id').eq('user_id', user_id).execute()
-            
-            if response.data and response.data[0]:
-                return response.data[0].get('sto_id')
+            # Fresh read: another worker may have just set or cleared sto_id
+            profile = self.get_user_profile(user_id, fresh=True)
+            if profile:
+                return profile.get('sto_id')
             return None
             
-        except Exception as e:
-            print(f"Error getting STO ID: {e}")
+        except Exception:
+            logger.exception("❌ Error getting STO ID")
             return None
     
     def cancel_user_subscription(self, user_id: str) -> bool:
         """Cancel user subscription and reset to free plan"""
         try:
-            from datetime import datetime, timezone
-            
             update_data = {
                 'plan_type': 'free',
                 'subscription_status': 'cancelled',
@@ -243,37 +611,45 @@ class SupabaseManager:
             # Always use admin client for write operations to bypass RLS
             client = self.admin_client or self.client
             response = client.schema('api').table('user_profiles').update(update_data).eq('user_id', user_id).execute()
+            self._profile_cache.pop(user_id)
             
             if response.data:
-                print(f"Cancelled subscription for user {user_id}")
+                logger.info("✅ Cancelled subscription for user %s", user_id)
                 return True
             return False
             
-        except Exception as e:
-            print(f"❌ Error cancelling subscription: {e}")
+        except Exception:
+            logger.exception("❌ Error cancelling subscription")
             return False
     
     def get_usage_stats(self, user_id: str) -> Dict[str, Any]:
         """Get user's API usage statistics"""
         try:
-            # Get today's usage
+            # Today's usage total and the profile limits in one round trip
+            # (see get_usage_stats in supabase_init.py). The function runs as the
+            # caller, so it needs the service-role client to see past RLS
             today = date.today().isoformat()
-            response = self.client.table('api_usage').select('*').eq('user_id', user_id).eq('usage_date', today).execute()
+            response = self._read_client.rpc('get_usage_stats', {
+                'p_user_id': user_id,
+                'p_usage_date': today
+            }).execute()
+            stats = response.data[0] if response.data else {}
             
-            total_today = sum(item['request_count'] for item in response.data)
+            total_today = stats.get('calls_today') or 0
             
-            # Get user profile for limits
-            profile = self.get_user_profile(user_id)
-            daily_limit = profile['daily_limit'] if profile else 10
+            # No profile row -> NULL limits, fall back to defaults
+            daily_limit = stats.get('daily_limit')
+            if daily_limit is None:
+                daily_limit = 10
             
             return {
                 'calls_today': total_today,
                 'daily_limit': daily_limit,
                 'remaining_calls': max(0, daily_limit - total_today),
-                'plan_type': profile['plan_type'] if profile else 'free'
+                'plan_type': stats.get('plan_type') or 'free'
             }
-        except Exception as e:
-            print(f"Error getting usage stats: {e}")
+        except Exception:
+            logger.exception("❌ Error getting usage stats")
             return {
                 'calls_today': 0,
                 'daily_limit': 50,
@@ -286,54 +662,70 @@ class SupabaseManager:
         try:
             stats = self.get_usage_stats(user_id)
             return stats['remaining_calls'] > 0
-        except Exception as e:
-            print(f"Error checking rate limit: {e}")
+        except Exception:
+            logger.exception("❌ Error checking rate limit")
             return False
     
     def verify_token(self, access_token: str) -> Optional[Dict[str, Any]]:
         """Verify JWT token and return user data"""
+        # blake2b is only a compact cache key here, not a security boundary
+        cache_key = hashlib.blake2b(access_token.encode(), digest_size=16).digest()
+        cached = self._jwt_cache.get(cache_key)
+        if cached is not None:
+            user_data, exp = cached
+            if exp is None or exp > time.time():
+                return user_data
+            self._jwt_cache.pop(cache_key)
+
+        # The local decode takes microseconds, so the Auth API is only asked
+        # when it can't produce a user
+        user_data = self._decode_local(access_token, cache_key)
+        if user_data is not None:
+            return user_data
+        return self._fetch_userinfo(access_token)
+
+    def _decode_local(self, access_token: str, cache_key: bytes) -> Optional[Dict[str, Any]]:
+        """User claims from the JWT itself, or None if it can't be decoded or has no sub"""
         try:
-            # First try to decode the JWT token to extract user info
-            import jwt
-            
-            # Decode without verification first to get user info
+            # Decode without verification to get user info
             # Since this is just for extracting user data and Supabase handles the security
             decoded_token = jwt.decode(access_token, options={"verify_signature": False})
-            print(f"JWT decoded successfully: {decoded_token.get('email')}")
-            
-            return {
-                'sub': decoded_token.get('sub'),
-                'email': decoded_token.get('email'),
-                'user_metadata': decoded_token.get('user_metadata', {}),
-                'app_metadata': decoded_token.get('app_metadata', {})
-            }
-                
         except Exception as e:
-            print(f"Error decoding JWT token: {e}")
+            logger.warning("⚠️ Error decoding JWT token: %s", e)
+            return None
+
+        if not decoded_token.get('sub'):
+            logger.warning("⚠️ JWT has no sub claim, verifying via API")
+            return None
+        logger.debug("JWT decoded successfully: %s", decoded_token.get('email'))
+
+        user_data = {
+            'sub': decoded_token.get('sub'),
+            'email': decoded_token.get('email'),
+            'user_metadata': decoded_token.get('user_metadata', {}),
+            'app_metadata': decoded_token.get('app_metadata', {})
+        }
+        self._jwt_cache.set(cache_key, (user_data, decoded_token.get('exp')))
+        return user_data
+
+    def _fetch_userinfo(self, access_token: str) -> Optional[Dict[str, Any]]:
+        """User data from the Supabase Auth API (fallback path)"""
+        try:
+            # apikey / Content-Type are set on the shared session
+            headers = {'Authorization': f'Bearer {access_token}'}
+            response = _auth_session.get(AUTH_USER_URL, headers=headers, timeout=AUTH_REQUEST_TIMEOUT)
             
-            # Fallback to the old method
-            try:
-                headers = {
-                    'apikey': SUPABASE_ANON_KEY,
-                    'Authorization': f'Bearer {access_token}',
-                    'Content-Type': 'application/json'
-                }
-                
-                import requests
-                response = requests.get(f"{SUPABASE_URL}/auth/v1/user", headers=headers)
-                
-                if response.status_code == 200:
-                    user_data = response.json()
-                    print(f"Token verified for user via API: {user_data.get('email')}")
-                    return user_data
-                else:
-                    print(f"Token verification failed: {response.status_code}")
-                    print(f"Response text: {response.text}")
-                    return None
-                    
-            except Exception as fallback_error:
-                print(f"Fallback verification also failed: {fallback_error}")
+            if response.status_code == 200:
+                user_data = response.json()
+                logger.debug("Token verified for user via API: %s", user_data.get('email'))
+                return user_data
+            else:
+                logger.warning("⚠️ Token verification failed: %s %s", response.status_code, response.text)
                 return None
+                
+        except Exception:
+            logger.exception("❌ Fallback verification also failed")
+            return None
 
 # Create a global instance
 supabase_manager = SupabaseManager()
@@ -2,205 +2,301 @@
 """
 Supabase initialization script for Talkapi
 Creates necessary tables and configurations for user management, API usage tracking, and history.
+
+All DDL is collected into one migration script and sent in a single exec_sql RPC call,
+so it costs one round trip and runs atomically (the function body executes inside the
+RPC's transaction; a failing statement rolls back the whole migration).
+
+exec_sql has to exist once before the first run (e.g. from the Supabase SQL editor):
+
+    CREATE OR REPLACE FUNCTION exec_sql(sql TEXT) RETURNS VOID AS $$
+    BEGIN
+        EXECUTE sql;
+    END;
+    $$ language 'plpgsql' SECURITY DEFINER;
+    REVOKE ALL ON FUNCTION exec_sql(TEXT) FROM PUBLIC, anon, authenticated;
 """
 
 import os
+from functools import lru_cache
 from supabase import create_client, Client
-from dotenv import load_dotenv
-import json
+from utils.env import load_env
 from datetime import datetime
+from typing import List, Optional, Tuple
 
-# Load environment variables
-load_dotenv()
+@lru_cache(maxsize=1)
+def create_clients() -> Tuple[Client, Optional[Client]]:
+    """
+    Anon and service-role Supabase clients from .env / the environment
 
-# Supabase configuration
-SUPABASE_URL = os.getenv('SUPABASE_URL')
-SUPABASE_KEY = os.getenv('SUPABASE_ANON_KEY')
+    Built on first call rather than at import, so build_migration_sql can be imported
+    without credentials. Exits when SUPABASE_URL / SUPABASE_ANON_KEY are missing.
+    """
+    load_env()
+    supabase_url = os.getenv('SUPABASE_URL')
+    supabase_key = os.getenv('SUPABASE_ANON_KEY')
+    supabase_service_key = os.getenv('SUPABASE_SERVICE_KEY')
 
-if not SUPABASE_URL or not SUPABASE_KEY:
-    print("❌ Error: SUPABASE_URL and SUPABASE_ANON_KEY must be set in .env file")
-    print("Please add your Supabase credentials to the .env file:")
-    print("SUPABASE_URL=your_supabase_project_url")
-    print("SUPABASE_ANON_KEY=your_supabase_anon_key")
-    exit(1)
+    if not supabase_url or not supabase_key:
+        print("❌ Error: SUPABASE_URL and SUPABASE_ANON_KEY must be set in .env file")
+        print("Please add your Supabase credentials to the .env file:")
+        print("SUPABASE_URL=your_supabase_project_url")
+        print("SUPABASE_ANON_KEY=your_supabase_anon_key")
+        exit(1)
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase = create_client(supabase_url, supabase_key)
+    # DDL needs the service role; exec_sql is not callable with the anon key
+    supabase_admin = create_client(supabase_url, supabase_service_key) if supabase_service_key else None
+    return supabase, supabase_admin
 
-def create_users_table():
-    """Create users table for authentication and user management"""
-    try:
-        # This table is typically created automatically by Supabase Auth
-        # But we can add custom fields if needed
-        print("✅ Users table is managed by Supabase Auth")
-        return True
-    except Exception as e:
-        print(f"❌ Error creating users table: {e}")
-        return False
+def create_users_table() -> List[str]:
+    """Users table for authentication and user management"""
+    # This table is managed by Supabase Auth - nothing to create
+    return []
 
-def create_api_usage_table():
-    """Create API usage tracking table"""
-    try:
-        # Create the api_usage table
-        query = """
-        CREATE TABLE IF NOT EXISTS api_usage (
-            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-            user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
-            endpoint VARCHAR(100) NOT NULL,
-            request_count INTEGER DEFAULT 1,
-            usage_date DATE DEFAULT CURRENT_DATE,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
-        """
-        
-        # Add indexes for better performance
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_api_usage_user_id ON api_usage(user_id);",
-            "CREATE INDEX IF NOT EXISTS idx_api_usage_date ON api_usage(usage_date);",
-            "CREATE INDEX IF NOT EXISTS idx_api_usage_endpoint ON api_usage(endpoint);"
-        ]
-        
-        # Execute the queries
-        for index in indexes:
-            supabase.table('api_usage').execute()
-        
-        print("✅ API usage table created successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Error creating api_usage table: {e}")
-        return False
+def create_api_usage_table() -> List[str]:
+    """API usage tracking table"""
+    query = """
+    CREATE TABLE IF NOT EXISTS api_usage (
+        id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+        user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+        endpoint VARCHAR(100) NOT NULL,
+        request_count INTEGER DEFAULT 1,
+        usage_date DATE DEFAULT CURRENT_DATE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        CONSTRAINT api_usage_user_endpoint_date_key UNIQUE (user_id, endpoint, usage_date)
+    );
+    """
 
-def create_api_history_table():
-    """Create API call history table"""
-    try:
-        # Create the api_history table
-        query = """
-        CREATE TABLE IF NOT EXISTS api_history (
-            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-            user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
-            user_query TEXT NOT NULL,
-            generated_code TEXT,
-            endpoint VARCHAR(255),
-            status VARCHAR(50) DEFAULT 'Success',
-            execution_result JSONB,
-            is_favorite BOOLEAN DEFAULT FALSE,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
+    # Tables created before the constraint existed may hold several rows per
+    # (user_id, endpoint, usage_date): fold their counts into the lowest id, drop
+    # the rest, then add the constraint track_api_usage_batch upserts against
+    dedupe = [
         """
-        
-        # Add indexes for better performance
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_api_history_user_id ON api_history(user_id);",
-            "CREATE INDEX IF NOT EXISTS idx_api_history_created_at ON api_history(created_at);",
-            "CREATE INDEX IF NOT EXISTS idx_api_history_status ON api_history(status);",
-            "CREATE INDEX IF NOT EXISTS idx_api_history_favorite ON api_history(is_favorite);"
-        ]
-        
-        # Execute the queries
-        for index in indexes:
-            supabase.table('api_history').execute()
-        
-        print("✅ API history table created successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Error creating api_history table: {e}")
-        return False
-
-def create_user_profiles_table():
-    """Create user profiles table for additional user data"""
-    try:
-        # Create the user_profiles table
-        query = """
-        CREATE TABLE IF NOT EXISTS user_profiles (
-            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-            user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE UNIQUE,
-            username VARCHAR(100),
-            full_name VARCHAR(255),
-            email VARCHAR(255),
-            plan_type VARCHAR(50) DEFAULT 'free',
-            daily_limit INTEGER DEFAULT 50,
-            api_calls_today INTEGER DEFAULT 0,
-            last_api_call_date DATE,
-            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
-            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
-        );
+        UPDATE api_usage u
+           SET request_count = d.total
+          FROM (SELECT (array_agg(id ORDER BY id))[1] AS keep_id, SUM(request_count) AS total
+                  FROM api_usage
+                 GROUP BY user_id, endpoint, usage_date
+                HAVING COUNT(*) > 1) d
+         WHERE u.id = d.keep_id;
+        """,
         """
-        
-        # Add indexes
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_user_profiles_user_id ON user_profiles(user_id);",
-            "CREATE INDEX IF NOT EXISTS idx_user_profiles_plan ON user_profiles(plan_type);"
-        ]
-        
-        # Execute the queries
-        for index in indexes:
-            supabase.table('user_profiles').execute()
-        
-        print("✅ User profiles table created successfully")
-        return True
-    except Exception as e:
-        print(f"❌ Error creating user_profiles table: {e}")
-        return False
+        DELETE FROM api_usage u
+         USING api_usage k
+         WHERE k.user_id = u.user_id
+           AND k.endpoint = u.endpoint
+           AND k.usage_date = u.usage_date
+           AND k.id < u.id;
+        """,
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'api_usage_user_endpoint_date_key') THEN
+                ALTER TABLE api_usage
+                    ADD CONSTRAINT api_usage_user_endpoint_date_key UNIQUE (user_id, endpoint, usage_date);
+            END IF;
+        END $$;
+        """
+    ]
 
-def create_row_level_security_policies():
-    """Create Row Level Security (RLS) policies for data protection"""
-    try:
-        # Enable RLS on tables
-        policies = [
-            # API Usage RLS
-            "ALTER TABLE api_usage ENABLE ROW LEVEL SECURITY;",
-            "CREATE POLICY 'Users can view own api_usage' ON api_usage FOR SELECT USING (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can insert own api_usage' ON api_usage FOR INSERT WITH CHECK (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can update own api_usage' ON api_usage FOR UPDATE USING (auth.uid() = user_id);",
-            
-            # API History RLS
-            "ALTER TABLE api_history ENABLE ROW LEVEL SECURITY;",
-            "CREATE POLICY 'Users can view own api_history' ON api_history FOR SELECT USING (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can insert own api_history' ON api_history FOR INSERT WITH CHECK (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can update own api_history' ON api_history FOR UPDATE USING (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can delete own api_history' ON api_history FOR DELETE USING (auth.uid() = user_id);",
-            
-            # User Profiles RLS
-            "ALTER TABLE user_profiles ENABLE ROW LEVEL SECURITY;",
-            "CREATE POLICY 'Users can view own profile' ON user_profiles FOR SELECT USING (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can insert own profile' ON user_profiles FOR INSERT WITH CHECK (auth.uid() = user_id);",
-            "CREATE POLICY 'Users can update own profile' ON user_profiles FOR UPDATE USING (auth.uid() = user_id);"
-        ]
-        
-        # Execute policies (in a real implementation, you'd use SQL directly)
-        print("✅ Row Level Security policies configured")
-        return True
-    except Exception as e:
-        print(f"❌ Error creating RLS policies: {e}")
-        return False
+    # Add indexes for better performance
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_api_usage_user_id ON api_usage(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_api_usage_date ON api_usage(usage_date);",
+        "CREATE INDEX IF NOT EXISTS idx_api_usage_endpoint ON api_usage(endpoint);",
+        # get_usage_stats sums one user's day; covering index makes it an index-only scan
+        "CREATE INDEX IF NOT EXISTS idx_api_usage_user_date ON api_usage(user_id, usage_date) INCLUDE (request_count);"
+    ]
+
+    return [query, *dedupe, *indexes]
+
+def create_api_history_table() -> List[str]:
+    """API call history table"""
+    query = """
+    CREATE TABLE IF NOT EXISTS api_history (
+        id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+        user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE,
+        user_query TEXT NOT NULL,
+        generated_code TEXT,
+        endpoint VARCHAR(255),
+        status VARCHAR(50) DEFAULT 'Success',
+        execution_result JSONB,
+        is_favorite BOOLEAN DEFAULT FALSE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    """
+
+    # Add indexes for better performance
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_api_history_user_id ON api_history(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_api_history_created_at ON api_history(created_at);",
+        # Keyset pagination in SupabaseManager.list_api_history
+        "CREATE INDEX IF NOT EXISTS idx_api_history_user_created_id ON api_history(user_id, created_at DESC, id DESC);",
+        "CREATE INDEX IF NOT EXISTS idx_api_history_status ON api_history(status);",
+        "CREATE INDEX IF NOT EXISTS idx_api_history_favorite ON api_history(is_favorite);"
+    ]
+
+    return [query, *indexes]
 
-def create_functions_and_triggers():
-    """Create database functions and triggers"""
+def create_user_profiles_table() -> List[str]:
+    """User profiles table for additional user data"""
+    # SupabaseManager reads and writes profiles through .schema('api')
+    schema = "CREATE SCHEMA IF NOT EXISTS api;"
+
+    query = """
+    CREATE TABLE IF NOT EXISTS api.user_profiles (
+        id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+        user_id UUID REFERENCES auth.users(id) ON DELETE CASCADE UNIQUE,
+        username VARCHAR(100),
+        full_name VARCHAR(255),
+        email VARCHAR(255),
+        plan_type VARCHAR(50) DEFAULT 'free',
+        daily_limit INTEGER DEFAULT 50,
+        api_calls_today INTEGER DEFAULT 0,
+        last_api_call_date DATE,
+        created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+    );
+    """
+
+    # Add indexes
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_user_profiles_user_id ON api.user_profiles(user_id);",
+        "CREATE INDEX IF NOT EXISTS idx_user_profiles_plan ON api.user_profiles(plan_type);"
+    ]
+
+    return [schema, query, *indexes]
+
+def create_row_level_security_policies() -> List[str]:
+    """Row Level Security (RLS) policies for data protection"""
+    # (table, policy name, command, clause) - policies are dropped first so re-runs are idempotent
+    policies = [
+        # API Usage RLS
+        ("api_usage", "Users can view own api_usage", "SELECT", "USING (auth.uid() = user_id)"),
+        ("api_usage", "Users can insert own api_usage", "INSERT", "WITH CHECK (auth.uid() = user_id)"),
+        ("api_usage", "Users can update own api_usage", "UPDATE", "USING (auth.uid() = user_id)"),
+
+        # API History RLS
+        ("api_history", "Users can view own api_history", "SELECT", "USING (auth.uid() = user_id)"),
+        ("api_history", "Users can insert own api_history", "INSERT", "WITH CHECK (auth.uid() = user_id)"),
+        ("api_history", "Users can update own api_history", "UPDATE", "USING (auth.uid() = user_id)"),
+        ("api_history", "Users can delete own api_history", "DELETE", "USING (auth.uid() = user_id)"),
+
+        # User Profiles RLS
+        ("api.user_profiles", "Users can view own profile", "SELECT", "USING (auth.uid() = user_id)"),
+        ("api.user_profiles", "Users can insert own profile", "INSERT", "WITH CHECK (auth.uid() = user_id)"),
+        ("api.user_profiles", "Users can update own profile", "UPDATE", "USING (auth.uid() = user_id)")
+    ]
+
+    statements = [
+        f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY;"
+        for table in ("api_usage", "api_history", "api.user_profiles")
+    ]
+    for table, name, command, clause in policies:
+        statements.append(f'DROP POLICY IF EXISTS "{name}" ON {table};')
+        statements.append(f'CREATE POLICY "{name}" ON {table} FOR {command} {clause};')
+    return statements
+
+def create_functions_and_triggers() -> List[str]:
+    """Database functions and triggers"""
+    # Function to update updated_at timestamp
+    function = """
+    CREATE OR REPLACE FUNCTION update_updated_at_column()
+    RETURNS TRIGGER AS $$
+    BEGIN
+        NEW.updated_at = NOW();
+        RETURN NEW;
+    END;
+    $$ language 'plpgsql';
+    """
+
+    # Usage total for one day plus the profile limits, used by
+    # SupabaseManager.get_usage_stats so a rate-limit check is a single round trip
+    usage_stats_function = """
+    CREATE OR REPLACE FUNCTION get_usage_stats(p_user_id UUID, p_usage_date DATE DEFAULT CURRENT_DATE)
+    RETURNS TABLE (calls_today BIGINT, daily_limit INTEGER, plan_type VARCHAR) AS $$
+        SELECT
+            (SELECT COALESCE(SUM(u.request_count), 0)
+               FROM api_usage u
+              WHERE u.user_id = p_user_id AND u.usage_date = p_usage_date),
+            p.daily_limit,
+            p.plan_type
+        FROM (SELECT 1) AS one
+        LEFT JOIN api.user_profiles p ON p.user_id = p_user_id;
+    $$ language 'sql' STABLE;
+    """
+
+    # Batched usage tracking: SupabaseManager.track_api_usage queues events and
+    # flushes them as [{user_id, endpoint, usage_date, count}, ...] in one call.
+    # One upsert against the unique key, so concurrent flushes from several workers
+    # can't both insert the same day's row. Events arrive already aggregated per key,
+    # which ON CONFLICT DO UPDATE requires (a key may appear only once per statement).
+    usage_batch_function = """
+    CREATE OR REPLACE FUNCTION track_api_usage_batch(p_events JSONB)
+    RETURNS VOID AS $$
+        INSERT INTO api_usage (user_id, endpoint, request_count, usage_date)
+        SELECT e.user_id, e.endpoint, e.count, e.usage_date
+          FROM jsonb_to_recordset(p_events) AS e(user_id UUID, endpoint VARCHAR, usage_date DATE, count INTEGER)
+        ON CONFLICT (user_id, endpoint, usage_date)
+        DO UPDATE SET request_count = api_usage.request_count + EXCLUDED.request_count;
+    $$ language 'sql';
+    """
+
+    # Atomic favorite toggle for SupabaseManager.toggle_favorite; returns the new
+    # is_favorite value, or NULL when the row doesn't exist / isn't the user's
+    toggle_favorite_function = """
+    CREATE OR REPLACE FUNCTION toggle_history_favorite(p_id UUID, p_user_id UUID)
+    RETURNS BOOLEAN AS $$
+    DECLARE
+        new_status BOOLEAN;
+    BEGIN
+        UPDATE api_history
+           SET is_favorite = NOT is_favorite
+         WHERE id = p_id AND user_id = p_user_id
+        RETURNING is_favorite INTO new_status;
+        RETURN new_status;
+    END;
+    $$ language 'plpgsql';
+    """
+
+    # Triggers for updated_at (dropped first so re-runs are idempotent)
+    triggers = []
+    for table in ("api_usage", "api_history", "api.user_profiles"):
+        # Trigger names can't be schema-qualified
+        name = f"update_{table.rpartition('.')[2]}_updated_at"
+        triggers.append(f"DROP TRIGGER IF EXISTS {name} ON {table};")
+        triggers.append(f"CREATE TRIGGER {name} BEFORE UPDATE ON {table} FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();")
+
+    return [function, usage_stats_function, usage_batch_function, toggle_favorite_function, *triggers]
+
+def build_migration_sql() -> str:
+    """Concatenate every DDL section, in dependency order, into one script"""
+    sections = [
+        create_users_table(),
+        create_api_usage_table(),
+        create_api_history_table(),
+        create_user_profiles_table(),
+        create_row_level_security_policies(),
+        create_functions_and_triggers()
+    ]
+    return "\n".join(statement.strip() for section in sections for statement in section)
+
+def run_migration(supabase_admin: Optional[Client] = None) -> bool:
+    """Run the whole migration in a single exec_sql round trip (service-role client from the environment by default)"""
+    if supabase_admin is None:
+        _, supabase_admin = create_clients()
+    if supabase_admin is None:
+        print("❌ SUPABASE_SERVICE_KEY must be set to run the migration")
+        return False
     try:
-        # Function to update updated_at timestamp
-        function = """
-        CREATE OR REPLACE FUNCTION update_updated_at_column()
-        RETURNS TRIGGER AS $$
-        BEGIN
-            NEW.updated_at = NOW();
-            RETURN NEW;
-        END;
-        $$ language 'plpgsql';
-        """
-        
-        # Triggers for updated_at
-        triggers = [
-            "CREATE TRIGGER update_api_usage_updated_at BEFORE UPDATE ON api_usage FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();",
-            "CREATE TRIGGER update_api_history_updated_at BEFORE UPDATE ON api_history FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();",
-            "CREATE TRIGGER update_user_profiles_updated_at BEFORE UPDATE ON user_profiles FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();"
-        ]
-        
-        print("✅ Database functions and triggers created")
+        supabase_admin.rpc('exec_sql', {'sql': build_migration_sql()}).execute()
+        print("✅ Tables, indexes, security policies, functions and triggers created")
         return True
     except Exception as e:
-        print(f"❌ Error creating functions and triggers: {e}")
+        print(f"❌ Migration failed (no changes applied): {e}")
         return False
 
 def insert_sample_data():
@@ -212,7 +308,7 @@ def insert_sample_data():
             "request_count": 1,
             "usage_date": datetime.now().date().isoformat()
         }
-        
+
         # Sample API history data
         sample_history = {
             "user_query": "How do I get weather data?",
@@ -221,7 +317,7 @@ def insert_sample_data():
             "status": "Success",
             "is_favorite": False
         }
-        
+
         print("✅ Sample data ready for insertion (requires authenticated user)")
         return True
     except Exception as e:
@@ -231,7 +327,8 @@ def insert_sample_data():
 def main():
     """Main initialization function"""
     print("🚀 Initializing Supabase for Talkapi...\n")
-    
+    supabase, supabase_admin = create_clients()
+
     # Test connection
     try:
         # Simple connection test
@@ -240,35 +337,22 @@ def main():
     except Exception as e:
         print(f"❌ Supabase connection failed: {e}")
         return False
-    
-    # Create tables
-    tables_created = all([
-        create_users_table(),
-        create_api_usage_table(),
-        create_api_history_table(),
-        create_user_profiles_table()
-    ])
-    
-    if not tables_created:
-        print("❌ Failed to create some tables")
+
+    # Tables, security policies, functions and triggers in one transaction
+    migrated = run_migration(supabase_admin)
+
+    if not migrated:
+        print("❌ Failed to apply the database migration")
         return False
-    
-    # Create security policies
-    security_created = create_row_level_security_policies()
-    
-    # Create functions and triggers
-    functions_created = create_functions_and_triggers()
-    
+
     # Prepare sample data
     sample_data_ready = insert_sample_data()
-    
+
     print("\n📊 Initialization Summary:")
-    print(f"   Tables: {'✅' if tables_created else '❌'}")
-    print(f"   Security: {'✅' if security_created else '❌'}")
-    print(f"   Functions: {'✅' if functions_created else '❌'}")
+    print(f"   Schema: {'✅' if migrated else '❌'}")
     print(f"   Sample Data: {'✅' if sample_data_ready else '❌'}")
-    
-    if all([tables_created, security_created, functions_created, sample_data_ready]):
+
+    if all([migrated, sample_data_ready]):
         print("\n🎉 Supabase initialization completed successfully!")
         print("\n📝 Next steps:")
         print("1. Configure authentication in Supabase dashboard")
@@ -281,4 +365,4 @@ def main():
         return False
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
\ No newline at end of file
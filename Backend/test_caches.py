@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process caches
+Tests:
+1. TTLCache expiry
+2. TTLCache LRU eviction
+3. get_user_profile caching and the fresh=True bypass
+4. list_api_history keyset cursor round trip
+
+No network access: SupabaseManager's clients are swapped for a fake query builder.
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# supabase_client builds its clients at import; these placeholders are never contacted
+os.environ.setdefault("SUPABASE_URL", "https://example.supabase.co")
+os.environ.setdefault("SUPABASE_ANON_KEY", "test.anon.key")
+
+from utils.ttl_cache import TTLCache
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _FakeQuery:
+    """Chainable stand-in for a supabase-py query; records every call it receives"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+        self.executes = 0
+        self._single = False
+
+    def __getattr__(self, name):
+        def method(*args, **kwargs):
+            self.calls.append((name, args))
+            return self
+        return method
+
+    def maybe_single(self):
+        self.calls.append(("maybe_single", ()))
+        self._single = True
+        return self
+
+    def execute(self):
+        self.executes += 1
+        if self._single:
+            self._single = False
+            return _Response(self.rows[0] if self.rows else None)
+        return _Response(list(self.rows))
+
+
+def _manager(fake):
+    from supabase_client import SupabaseManager
+
+    manager = SupabaseManager()
+    manager.client = fake
+    manager._read_client = fake
+    return manager
+
+
+def test_1_ttl_cache_expiry():
+    """Test 1: entries are served until their TTL passes, then dropped"""
+    cache = TTLCache(maxsize=10, ttl=0.05)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert "a" not in cache._data
+
+    cache.set("b", 2)
+    cache.pop("b")
+    assert cache.get("b") is None
+    cache.pop("missing")
+
+
+def test_2_ttl_cache_eviction():
+    """Test 2: past maxsize the least recently used entry is evicted"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache.set("a", 10)  # overwriting refreshes recency, not the size
+    cache.set("d", 4)
+    assert cache.get("c") is None
+    assert cache.get("a") == 10
+
+
+def test_3_profile_cache_fresh_bypass():
+    """Test 3: cached reads skip the database, fresh=True reads it and refreshes the cache"""
+    fake = _FakeQuery([{"user_id": "u1", "api_calls_today": 1}])
+    manager = _manager(fake)
+
+    assert manager.get_user_profile("u1")["api_calls_today"] == 1
+    assert manager.get_user_profile("u1")["api_calls_today"] == 1
+    assert fake.executes == 1
+
+    # Callers get copies - mutating one must not change the cached row
+    manager.get_user_profile("u1")["api_calls_today"] = 99
+    assert manager.get_user_profile("u1")["api_calls_today"] == 1
+
+    # Another worker bumps the counter: the cached read is stale, fresh=True is not
+    fake.rows = [{"user_id": "u1", "api_calls_today": 2}]
+    assert manager.get_user_profile("u1")["api_calls_today"] == 1
+    assert manager.get_user_profile("u1", fresh=True)["api_calls_today"] == 2
+    assert fake.executes == 2
+
+    # ... and the fresh row replaced the cached one
+    assert manager.get_user_profile("u1")["api_calls_today"] == 2
+    assert fake.executes == 2
+
+    # Missing profiles are not cached
+    fake.rows = []
+    assert manager.get_user_profile("u2") is None
+    assert manager.get_user_profile("u2") is None
+    assert fake.executes == 4
+
+
+def test_4_history_cursor_round_trip():
+    """Test 4: next_cursor decodes to the last row and drives the next page's filter"""
+    from supabase_client import SupabaseManager
+
+    row = {"id": "6f1c2a9e-2b1d-4c55-9a3e-0d8c7b6a5f41", "created_at": "2026-10-16T16:25:16.123456+00:00"}
+    cursor = SupabaseManager._encode_history_cursor(row)
+    assert SupabaseManager._decode_history_cursor(cursor) == (row["created_at"], row["id"])
+
+    rows = [
+        {"id": "3", "created_at": "2026-10-16T10:00:00+00:00"},
+        {"id": "2", "created_at": "2026-10-16T09:00:00+00:00"},
+    ]
+    fake = _FakeQuery(rows)
+    manager = _manager(fake)
+
+    # A full page hands out a cursor for its last row
+    page = manager.list_api_history("u1", limit=2)
+    assert page["data"] == rows
+    assert SupabaseManager._decode_history_cursor(page["next_cursor"]) == (rows[-1]["created_at"], "2")
+
+    # Passing it back filters strictly past that row in (created_at, id) order
+    fake.calls.clear()
+    fake.rows = rows[:1]
+    page = manager.list_api_history("u1", limit=2, cursor=page["next_cursor"])
+    filters = [args[0] for name, args in fake.calls if name == "or_"]
+    assert filters == [
+        'created_at.lt."2026-10-16T09:00:00+00:00",'
+        'and(created_at.eq."2026-10-16T09:00:00+00:00",id.lt.2)'
+    ]
+    # A short page is the last one
+    assert page["next_cursor"] is None
+
+    # A tampered cursor is rejected, not turned into a filter
+    fake.calls.clear()
+    assert manager.list_api_history("u1", cursor="bm90LWEtY3Vyc29y") == {"data": [], "next_cursor": None}
+    assert not [name for name, _ in fake.calls if name == "or_"]
+
+
+def main():
+    """Run all tests"""
+    tests = {
+        "TTLCache Expiry": test_1_ttl_cache_expiry,
+        "TTLCache Eviction": test_2_ttl_cache_eviction,
+        "Profile Fresh Bypass": test_3_profile_cache_fresh_bypass,
+        "History Cursor": test_4_history_cursor_round_trip,
+    }
+    results = {}
+    for name, test_fn in tests.items():
+        try:
+            test_fn()
+            results[name] = True
+        except AssertionError as e:
+            print(f"[ERROR] {name}: {e}")
+            results[name] = False
+
+    for test_name, passed in results.items():
+        status = "[PASSED]" if passed else "[FAILED]"
+        print(f"{test_name:25} {status}")
+
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for the pre-encoded HTML email parts
+Tests:
+1. Encoding the static head once and the body per send gives the same
+   quoted-printable payload as EmailMessage encoding the whole HTML part
+2. Built messages decode back to the exact HTML that was rendered
+"""
+
+import os
+import sys
+from email.message import EmailMessage
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services import email_service
+
+HEADS = {
+    "payment_success": (email_service._PAYMENT_SUCCESS_HEAD, email_service._PAYMENT_SUCCESS_HEAD_QP),
+    "subscription_cancelled": (email_service._SUBSCRIPTION_CANCELLED_HEAD, email_service._SUBSCRIPTION_CANCELLED_HEAD_QP),
+}
+
+# Bodies that exercise the QP edge cases: non-ASCII, '=', trailing whitespace,
+# a leading dot and lines longer than the soft-break limit
+BODIES = [
+    "<p>Hello</p>",
+    "<p>Hëllo wörld – שלום 👋</p>\n<p>a = b</p>",
+    "<td>trailing space </td>\n<td>trailing tab\t</td>\n.leading dot",
+    "<p>" + "x" * 200 + "</p>\n<p>" + "é" * 120 + "</p>",
+]
+
+
+def _reference_payload(html: str) -> str:
+    """What EmailMessage itself produces for the whole HTML part"""
+    part = EmailMessage()
+    part.set_content(html, subtype="html", cte="quoted-printable")
+    return part.get_payload()
+
+
+def _html_part(msg: EmailMessage) -> EmailMessage:
+    return next(part for part in msg.walk() if part.get_content_type() == "text/html")
+
+
+def test_1_split_encoding_matches_whole():
+    """Test 1: head_qp + encoded body == EmailMessage's encoding of head + body"""
+    for name, (head, head_qp) in HEADS.items():
+        for body in BODIES:
+            split = head_qp + email_service._qp_encode(body + "\n")
+            assert split == _reference_payload(head + body + "\n"), f"{name}: {body[:30]!r}"
+
+
+def test_2_built_messages_round_trip():
+    """Test 2: the HTML part of a built message decodes to head + rendered body"""
+    messages = {
+        "payment_success": email_service._build_payment_success_message(
+            "user@example.com", "Dana Lévy", 19.0, "pro", "12345", "https://example.com/inv/1", 100, 2000
+        ),
+        "subscription_cancelled": email_service._build_subscription_cancelled_message(
+            "user@example.com", "Dana Lévy"
+        ),
+    }
+    for name, msg in messages.items():
+        part = _html_part(msg)
+        html = part.get_content()
+        head, _ = HEADS[name]
+        assert html.startswith(head), name
+        assert "Dana Lévy" in html, name
+        assert part.get_payload() == _reference_payload(html), name
+
+
+def main():
+    """Run all tests"""
+    tests = {
+        "Split QP Encoding": test_1_split_encoding_matches_whole,
+        "Message Round Trip": test_2_built_messages_round_trip,
+    }
+    results = {}
+    for name, test_fn in tests.items():
+        try:
+            test_fn()
+            results[name] = True
+        except AssertionError as e:
+            print(f"[ERROR] {name}: {e}")
+            results[name] = False
+
+    for test_name, passed in results.items():
+        status = "[PASSED]" if passed else "[FAILED]"
+        print(f"{test_name:25} {status}")
+
+    return 0 if all(results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,13 @@
+"""
+Environment Loading
+Parse the .env file once per process, however many modules ask for it
+"""
+from functools import lru_cache
+
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=1)
+def load_env() -> bool:
+    """Load .env into os.environ on the first call; later calls are no-ops"""
+    return load_dotenv()
@@ -2,9 +2,11 @@
 Error Handler Utilities
 Standardized error responses for API endpoints
 """
-from datetime import datetime
-from typing import Dict, Any, List, Optional
-from flask import jsonify, Response
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Sequence
+import orjson
+from flask import Response
 
 
 class ErrorCode:
@@ -40,6 +42,40 @@ class ErrorCode:
     INVALID_API_CONFIG = 'INVALID_API_CONFIG'
 
 
+def _now_iso() -> str:
+    """Current UTC time as ISO-8601 with millisecond precision and a 'Z' suffix"""
+    # isoformat() ends in '+00:00' for UTC; swap it for the 'Z' clients already expect
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds')[:-6] + 'Z'
+
+
+# Fixed suggestion lists, built once instead of per error response.
+# Tuples so a response can't mutate the shared value (serialized as JSON arrays).
+_VALIDATION_SUGGESTIONS = ('Please fix the validation errors listed in details',)
+_AUTH_SUGGESTIONS = (
+    'Provide valid authentication credentials',
+    'Check if your API key or token is correct',
+    'Verify your credentials have not expired'
+)
+_PERMISSION_SUGGESTIONS = (
+    'Verify your account has the necessary permissions',
+    'Contact your administrator for access'
+)
+_QUOTA_SUGGESTIONS = (
+    'Upgrade your plan for more quota',
+    'Wait for your quota to reset',
+    'Contact support if you believe this is an error'
+)
+_INTERNAL_SUGGESTIONS = (
+    'This is not your fault - the server encountered an error',
+    'Please try again in a few moments'
+)
+_LLM_SUGGESTIONS = (
+    'The AI service encountered an error',
+    'Please try again with a simpler request',
+    'If the problem persists, contact support'
+)
+
+
 class ErrorResponse:
     """Standardized error response builder"""
 
@@ -49,7 +85,7 @@ class ErrorResponse:
         message: str,
         status_code: int = 400,
         details: Optional[Dict[str, Any]] = None,
-        suggestions: Optional[List[str]] = None,
+        suggestions: Optional[Sequence[str]] = None,
         request_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """
@@ -71,7 +107,7 @@ class ErrorResponse:
             'error_code': error_code,
             'message': message,
             'status_code': status_code,
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
+            'timestamp': _now_iso()
         }
 
         if details:
@@ -92,14 +128,12 @@ class ErrorResponse:
         request_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Build validation error response"""
-        suggestions = ['Please fix the validation errors listed in details']
-
         return ErrorResponse.build(
             error_code=ErrorCode.VALIDATION_FAILED,
             message=message,
             status_code=400,
             details={'validation_errors': validation_errors},
-            suggestions=suggestions,
+            suggestions=_VALIDATION_SUGGESTIONS,
             request_id=request_id
         )
 
@@ -128,11 +162,7 @@ class ErrorResponse:
             error_code=ErrorCode.AUTH_REQUIRED,
             message=message,
             status_code=401,
-            suggestions=[
-                'Provide valid authentication credentials',
-                'Check if your API key or token is correct',
-                'Verify your credentials have not expired'
-            ],
+            suggestions=_AUTH_SUGGESTIONS,
             request_id=request_id
         )
 
@@ -147,10 +177,7 @@ class ErrorResponse:
             message=f'You do not have permission to access this {resource}',
             status_code=403,
             details={'resource': resource},
-            suggestions=[
-                'Verify your account has the necessary permissions',
-                'Contact your administrator for access'
-            ],
+            suggestions=_PERMISSION_SUGGESTIONS,
             request_id=request_id
         )
 
@@ -214,11 +241,7 @@ class ErrorResponse:
             message=f'Your {quota_type} quota has been exceeded',
             status_code=402,  # Payment Required
             details={'quota_type': quota_type},
-            suggestions=[
-                'Upgrade your plan for more quota',
-                'Wait for your quota to reset',
-                'Contact support if you believe this is an error'
-            ],
+            suggestions=_QUOTA_SUGGESTIONS,
             request_id=request_id
         )
 
@@ -229,13 +252,9 @@ class ErrorResponse:
         request_id: Optional[str] = None
     ) -> Dict[str, Any]:
         """Build internal server error response"""
-        suggestions = [
-            'This is not your fault - the server encountered an error',
-            'Please try again in a few moments'
-        ]
-
+        suggestions = _INTERNAL_SUGGESTIONS
         if request_id:
-            suggestions.append(f'If the problem persists, contact support with request ID: {request_id}')
+            suggestions = (*suggestions, f'If the problem persists, contact support with request ID: {request_id}')
 
         return ErrorResponse.build(
             error_code=ErrorCode.INTERNAL_ERROR,
@@ -276,15 +295,29 @@ class ErrorResponse:
             message='Failed to generate code examples',
             status_code=500,
             details={'llm_error': error_message},
-            suggestions=[
-                'The AI service encountered an error',
-                'Please try again with a simpler request',
-                'If the problem persists, contact support'
-            ],
+            suggestions=_LLM_SUGGESTIONS,
             request_id=request_id
         )
 
 
+def _orjson_default(obj: Any) -> Any:
+    """Types Flask's JSON provider serialized that orjson doesn't (Decimal, Markup-like __html__ objects)"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_response(obj: Any, status: int) -> Response:
+    """JSON response serialized with orjson (emits bytes directly, much faster than stdlib json)"""
+    return Response(
+        orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS),
+        status=status,
+        mimetype='application/json'
+    )
+
+
 def make_error_response(error_dict: Dict[str, Any]) -> Response:
     """
     Create Flask response from error dictionary
@@ -295,8 +328,7 @@ def make_error_response(error_dict: Dict[str, Any]) -> Response:
     Returns:
         Flask Response object
     """
-    status_code = error_dict.get('status_code', 500)
-    return jsonify(error_dict), status_code
+    return _json_response(error_dict, error_dict.get('status_code', 500))
 
 
 def make_success_response(
@@ -318,7 +350,7 @@ def make_success_response(
     response = {
         'success': True,
         'data': data,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'timestamp': _now_iso()
     }
 
     if message:
@@ -327,7 +359,7 @@ def make_success_response(
     if request_id:
         response['request_id'] = request_id
 
-    return jsonify(response), 200
+    return _json_response(response, 200)
 
 
 # Convenience functions for common errors
@@ -363,7 +395,11 @@ def not_found_response(resource: str, resource_id: Optional[str] = None, request
 def rate_limit_response(retry_after: Optional[int] = None, request_id: Optional[str] = None):
     """Create rate limit error response"""
     error_dict = ErrorResponse.rate_limit_error(retry_after, request_id)
-    return make_error_response(error_dict)
+    response = make_error_response(error_dict)
+    if retry_after:
+        # Standard header, so HTTP clients with retry/backoff support wait the right amount
+        response.headers['Retry-After'] = str(retry_after)
+    return response
 
 
 def quota_exceeded_response(quota_type: str = 'API calls', request_id: Optional[str] = None):
@@ -0,0 +1,51 @@
+"""
+Queued Logging
+Moves the root logger's handler I/O onto a background thread, so request threads
+only enqueue records and never block on stream writes
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+from typing import List, Optional
+
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+_handlers: List[logging.Handler] = []
+
+
+def _start_listener() -> None:
+    listener = logging.handlers.QueueListener(_queue_handler.queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+
+def _restart_listener_after_fork() -> None:
+    # A forked child (e.g. a gunicorn worker with preload_app) doesn't inherit the
+    # listener thread, so give it its own. It also gets a fresh queue: records the
+    # parent hadn't written yet at fork time are the parent's to write, not the child's
+    if _queue_handler is not None:
+        _queue_handler.queue = queue.Queue(-1)
+        _start_listener()
+
+
+def install_queue_logging() -> None:
+    """
+    Serve the root logger's current handlers from a QueueListener thread
+
+    Call once after the app has configured logging (level, format, handlers);
+    later calls are no-ops. Loggers keep propagating to the root as usual.
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    root = logging.getLogger()
+    _handlers.extend(root.handlers)
+    for handler in _handlers:
+        root.removeHandler(handler)
+    _queue_handler = logging.handlers.QueueHandler(queue.Queue(-1))
+    root.addHandler(_queue_handler)
+    _start_listener()
+
+
+os.register_at_fork(after_in_child=_restart_listener_after_fork)
@@ -19,6 +19,10 @@ class LogLevel(Enum):
     CRITICAL = 'CRITICAL'
 
 
+# Context fields rendered in their own [..] tag; everything else goes in the key=value group
+_KNOWN_FIELDS = frozenset({'request_id', 'user_id', 'endpoint', 'duration_ms'})
+
+
 class StructuredLogger:
     """
     Structured logger with request ID tracking and consistent formatting
@@ -71,40 +75,42 @@ class StructuredLogger:
         if 'duration_ms' in extra:
             parts.append(f"[duration={extra['duration_ms']}ms]")
 
-        # Add other fields as key=value pairs
-        other_fields = {k: v for k, v in extra.items()
-                       if k not in ['request_id', 'user_id', 'endpoint', 'duration_ms']}
-
-        if other_fields:
-            field_strs = [f"{k}={v}" for k, v in other_fields.items()]
+        # Add other fields as key=value pairs (single pass, no intermediate dict)
+        field_strs = [f"{k}={v}" for k, v in extra.items() if k not in _KNOWN_FIELDS]
+        if field_strs:
             parts.append(f"[{', '.join(field_strs)}]")
 
         return ' '.join(parts)
 
     def debug(self, message: str, extra: Optional[Dict[str, Any]] = None):
         """Log debug message"""
-        formatted = self._format_message(message, extra)
-        self.logger.debug(formatted)
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self.logger.debug(self._format_message(message, extra))
 
     def info(self, message: str, extra: Optional[Dict[str, Any]] = None):
         """Log info message"""
-        formatted = self._format_message(message, extra)
-        self.logger.info(formatted)
+        if not self.logger.isEnabledFor(logging.INFO):
+            return
+        self.logger.info(self._format_message(message, extra))
 
     def warning(self, message: str, extra: Optional[Dict[str, Any]] = None):
         """Log warning message"""
-        formatted = self._format_message(message, extra)
-        self.logger.warning(formatted)
+        if not self.logger.isEnabledFor(logging.WARNING):
+            return
+        self.logger.warning(self._format_message(message, extra))
 
     def error(self, message: str, extra: Optional[Dict[str, Any]] = None, exc_info=False):
         """Log error message"""
-        formatted = self._format_message(message, extra)
-        self.logger.error(formatted, exc_info=exc_info)
+        if not self.logger.isEnabledFor(logging.ERROR):
+            return
+        self.logger.error(self._format_message(message, extra), exc_info=exc_info)
 
     def critical(self, message: str, extra: Optional[Dict[str, Any]] = None, exc_info=False):
         """Log critical message"""
-        formatted = self._format_message(message, extra)
-        self.logger.critical(formatted, exc_info=exc_info)
+        if not self.logger.isEnabledFor(logging.CRITICAL):
+            return
+        self.logger.critical(self._format_message(message, extra), exc_info=exc_info)
 
 
 class RequestLogger:
@@ -146,9 +152,11 @@ class RequestLogger:
         if errors:
             context['validation_errors'] = len(errors)
             self.logger.warning('Validation failed', extra=context)
-            for error in errors:
-                self.logger.debug(f"Validation error: {error.get('field')} - {error.get('message')}",
-                                extra=self.context)
+            # Skip building one message per error when DEBUG is filtered out
+            if self.logger.logger.isEnabledFor(logging.DEBUG):
+                for error in errors:
+                    self.logger.debug(f"Validation error: {error.get('field')} - {error.get('message')}",
+                                    extra=self.context)
         else:
             self.logger.debug('Validation passed', extra=context)
 
@@ -0,0 +1,42 @@
+"""
+Prometheus Metrics
+Latency and error metrics for outbound Tranzila API calls, exposed on /metrics
+"""
+import os
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, generate_latest, multiprocess
+
+TRANZILA_LATENCY = Histogram(
+    'tranzila_request_seconds',
+    'Tranzila API request latency in seconds',
+    ['endpoint', 'status'],
+    buckets=(.05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+)
+
+TRANZILA_ERRORS = Counter(
+    'tranzila_errors_total',
+    'Tranzila API calls that failed before returning a response',
+    ['endpoint', 'kind']
+)
+
+
+def observe_tranzila_request(endpoint: str, status: int, started_at: float):
+    """Record one completed Tranzila request (started_at from time.perf_counter())"""
+    TRANZILA_LATENCY.labels(endpoint=endpoint, status=str(status)).observe(time.perf_counter() - started_at)
+
+
+def record_tranzila_error(endpoint: str, kind: str):
+    """Count a Tranzila request that failed with no response (kind: timeout, http, ...)"""
+    TRANZILA_ERRORS.labels(endpoint=endpoint, kind=kind).inc()
+
+
+def render_metrics() -> bytes:
+    """Exposition text for /metrics, aggregated over all workers when running under gunicorn"""
+    # With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py) each worker writes its samples
+    # to files there, and the default registry would only show the worker serving this request
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
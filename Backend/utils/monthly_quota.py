@@ -37,7 +37,7 @@ def check_and_decrement(supabase_mgr, user_id: str, usage: str = "convert") -> N
             }
         else:
             # Get user profile to check current quota
-            profile = supabase_mgr.get_user_profile(user_id)
+            profile = supabase_mgr.get_user_profile(user_id, fresh=True)
             if not profile:
                 raise ValueError("User profile not found")
         
@@ -111,7 +111,7 @@ def get_remaining_quota(supabase_mgr, user_id: str) -> dict:
                 'total_limit': 10
             }
         
-        profile = supabase_mgr.get_user_profile(user_id)
+        profile = supabase_mgr.get_user_profile(user_id, fresh=True)
         if not profile:
             return {"error": "User profile not found"}
         